@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import (FavoritRecipe, Ingredient, IngredientForRecipe, Recipe,
-                     ShoppingList, Tag, TagForRecipe)
+from .models import (FavoritRecipe, ImageJob, Ingredient, IngredientForRecipe,
+                     Recipe, ShoppingList, Tag, TagForRecipe)
 
 
 @admin.register(Tag)
@@ -24,7 +24,7 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = "-empty-"
 
     def in_favorites(self, obj):
-        return obj.is_favorite_for_users.all().count()
+        return obj.favorites_count
 
 
 @admin.register(TagForRecipe)
@@ -51,3 +51,9 @@ class FavoritRecipeAdmin(admin.ModelAdmin):
 @admin.register(ShoppingList)
 class ShoppingListAdmin(FavoritRecipeAdmin):
     pass
+
+
+@admin.register(ImageJob)
+class ImageJobAdmin(admin.ModelAdmin):
+    list_display = ("pk", "recipe", "status", "attempts", "updated")
+    list_filter = ("status",)
@@ -0,0 +1,400 @@
+import base64
+import io
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.utils.urls import replace_query_param
+
+from backend.middleware import QueryRecorder
+from backend.parsers import FastJSONParser
+from backend.renderers import FastJSONRenderer
+
+from .benchmark_data import (BENCHMARK_INGREDIENT_PREFIX,
+                             BENCHMARK_TAG_SLUG_PREFIX, benchmark_ingredients,
+                             benchmark_users)
+from .exporters import SHOP_LIST_EXPORTERS
+from .filters import IngredientFilter
+from .ingredient_index import ingredient_index
+from .models import Ingredient, Recipe, Tag
+from .read_serializers import RecipeReadSerializer
+from .serializers import FromBase64ToImg, RecipeSerializer
+from .views import RecipeViewSet
+
+BENCHMARKS = {}
+LARGE_IMAGE_SIZE = 8 * 1024 * 1024
+SERIALIZED_PAGE_SIZE = 100
+SHOP_LIST_SIZES = (10, 100, 1000)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def benchmark(name):
+    def register(run):
+        BENCHMARKS[name] = run
+        return run
+    return register
+
+
+def encode_image(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/{image_format.lower()};base64,{encoded}'
+
+
+class BenchmarkContext:
+    def __init__(self):
+        self.reader = benchmark_users().order_by('id').first()
+        if self.reader is None:
+            raise BenchmarkError('No benchmark data, run seed_benchmark')
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        self.anonymous = APIClient()
+        self.recipe = Recipe.objects.order_by('-favorites_count').first()
+        self.tag_slug = Tag.objects.filter(
+            slug__startswith=BENCHMARK_TAG_SLUG_PREFIX
+        ).values_list('slug', flat=True).first()
+        self.ingredient_prefix = benchmark_ingredients().values_list(
+            'name', flat=True
+        ).first()[:len(BENCHMARK_INGREDIENT_PREFIX) + 2]
+        self.new_recipe = {
+            'name': 'Benchmark recipe',
+            'text': 'Benchmark recipe text',
+            'cooking_time': 10,
+            'image': encode_image(Image.new('RGB', (64, 64)), 'PNG'),
+            'tags': list(self.recipe.tags.values_list('id', flat=True)),
+            'ingredients': [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in
+                self.recipe.ingredientforrecipe_set.values_list(
+                    'ingredient_id', 'amount'
+                )
+            ],
+        }
+        self._large_image = None
+        self._feed_next = None
+        self._page = None
+        self._json = None
+
+    @property
+    def large_image(self):
+        if self._large_image is None:
+            # Noise does not compress, so the PNG is about as big as asked.
+            side = int(math.sqrt(LARGE_IMAGE_SIZE / 3))
+            self._large_image = encode_image(
+                Image.frombytes('RGB', (side, side),
+                                os.urandom(side * side * 3)),
+                'PNG'
+            )
+        return self._large_image
+
+    @property
+    def feed_next(self):
+        """Feed link after the first half of the cached timeline."""
+        if self._feed_next is None:
+            limit = max(settings.FEED_CACHE_SIZE // 2, 1)
+            self._feed_next = json.loads(
+                self.get(f'/api/recipes/feed/?limit={limit}')
+            )['next']
+            if self._feed_next is None:
+                raise BenchmarkError('The reader feed has a single page')
+            self._feed_next = replace_query_param(
+                self._feed_next, 'limit', 6
+            )
+        return self._feed_next
+
+    @property
+    def page(self):
+        """Recipes loaded like the list view does, with a request."""
+        if self._page is None:
+            request = Request(APIRequestFactory().get('/api/recipes/'))
+            request.user = self.reader
+            recipes = list(
+                RecipeViewSet.queryset[:SERIALIZED_PAGE_SIZE]
+            )
+            context = {'request': request}
+            drf = RecipeSerializer(recipes, many=True, context=context).data
+            fast = RecipeReadSerializer(
+                recipes,
+                many=True,
+                context=context
+            ).data
+            if json.loads(json.dumps(drf)) != fast:
+                raise BenchmarkError('Read serializer output differs')
+            self._page = (recipes, context)
+        return self._page
+
+    @property
+    def json(self):
+        """A recipe page and the whole ingredient list, as data and JSON."""
+        if self._json is None:
+            recipes, serializer_context = self.page
+            data = {
+                'recipes': RecipeReadSerializer(
+                    recipes,
+                    many=True,
+                    context=serializer_context
+                ).data,
+                'ingredients': list(
+                    Ingredient.objects.values('id', 'name', 'measurement_unit')
+                ),
+            }
+            rendered = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != rendered:
+                raise BenchmarkError('Fast JSON renderer output differs')
+            self._json = (data, rendered)
+        return self._json
+
+    def get(self, url, client=None):
+        response = (client or self.client).get(url)
+        if response.status_code >= 400:
+            raise BenchmarkError(f'{url} returned {response.status_code}')
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+
+@benchmark('recipe_list')
+def recipe_list(context):
+    context.get('/api/recipes/?limit=6')
+
+
+@benchmark('recipe_list_uncached')
+def recipe_list_uncached(context):
+    with override_settings(RECIPE_CACHE_TIMEOUT=0):
+        context.get('/api/recipes/?limit=6')
+
+
+@benchmark('recipe_list_anonymous')
+def recipe_list_anonymous(context):
+    context.get('/api/recipes/?limit=6', context.anonymous)
+
+
+@benchmark('recipe_list_keyset')
+def recipe_list_keyset(context):
+    context.get('/api/recipes/?cursor=&limit=6')
+
+
+@benchmark('recipe_list_tags')
+def recipe_list_tags(context):
+    context.get(f'/api/recipes/?tags={context.tag_slug}&limit=6')
+
+
+@benchmark('recipe_list_favorited')
+def recipe_list_favorited(context):
+    context.get('/api/recipes/?is_favorited=true&limit=6')
+
+
+@benchmark('recipe_search')
+def recipe_search(context):
+    context.get('/api/recipes/?search=recipe&limit=6')
+
+
+@benchmark('recipe_detail')
+def recipe_detail(context):
+    context.get(f'/api/recipes/{context.recipe.pk}/')
+
+
+@benchmark('recipe_popular')
+def recipe_popular(context):
+    context.get('/api/recipes/popular/?limit=6')
+
+
+@benchmark('recipe_feed')
+def recipe_feed(context):
+    context.get('/api/recipes/feed/?limit=6')
+
+
+@benchmark('recipe_feed_deep')
+def recipe_feed_deep(context):
+    context.get(context.feed_next)
+
+
+@benchmark('recipe_feed_uncached')
+def recipe_feed_uncached(context):
+    with override_settings(FEED_CACHE_SIZE=0):
+        context.get(context.feed_next)
+
+
+@benchmark('subscriptions')
+def subscriptions(context):
+    context.get('/api/users/subscriptions/?recipes_limit=3')
+
+
+@benchmark('ingredient_autocomplete')
+def ingredient_autocomplete(context):
+    context.get(f'/api/ingredients/?name={context.ingredient_prefix}')
+
+
+@benchmark('ingredient_search_index')
+def ingredient_search_index(context):
+    ingredient_index.search(context.ingredient_prefix)
+
+
+@benchmark('ingredient_search_orm')
+def ingredient_search_orm(context):
+    list(IngredientFilter(
+        {'name': context.ingredient_prefix},
+        Ingredient.objects.all()
+    ).qs.values('id', 'name', 'measurement_unit'))
+
+
+def shopping_cart_benchmark(file_format):
+    def download_shopping_cart(context):
+        context.get(
+            f'/api/recipes/download_shopping_cart/?format={file_format}'
+        )
+    return download_shopping_cart
+
+
+def shop_list_benchmark(exporter, size):
+    # Growth with the number of distinct ingredients in the cart,
+    # without the database part of the download.
+    rows = [(f'ингредиент {index}', 'г', index) for index in range(size)]
+
+    def render_shop_list(context):
+        for __ in exporter.render(iter(rows)):
+            pass
+    return render_shop_list
+
+
+for file_format, exporter in SHOP_LIST_EXPORTERS.items():
+    benchmark(f'download_shopping_cart_{file_format}')(
+        shopping_cart_benchmark(file_format)
+    )
+    for size in SHOP_LIST_SIZES:
+        benchmark(f'shop_list_{file_format}_{size}')(
+            shop_list_benchmark(exporter, size)
+        )
+
+
+@benchmark('serialize_recipes_drf')
+def serialize_recipes_drf(context):
+    recipes, serializer_context = context.page
+    RecipeSerializer(recipes, many=True, context=serializer_context).data
+
+
+@benchmark('serialize_recipes_fast')
+def serialize_recipes_fast(context):
+    recipes, serializer_context = context.page
+    RecipeReadSerializer(recipes, many=True, context=serializer_context).data
+
+
+@benchmark('render_json_drf')
+def render_json_drf(context):
+    JSONRenderer().render(context.json[0])
+
+
+@benchmark('render_json_fast')
+def render_json_fast(context):
+    FastJSONRenderer().render(context.json[0])
+
+
+@benchmark('parse_json_drf')
+def parse_json_drf(context):
+    JSONParser().parse(io.BytesIO(context.json[1]))
+
+
+@benchmark('parse_json_fast')
+def parse_json_fast(context):
+    FastJSONParser().parse(io.BytesIO(context.json[1]))
+
+
+@benchmark('recipe_create')
+def recipe_create(context):
+    with transaction.atomic():
+        response = context.client.post(
+            '/api/recipes/',
+            context.new_recipe,
+            format='json'
+        )
+        transaction.set_rollback(True)
+    if response.status_code != 201:
+        raise BenchmarkError(f'recipe create returned {response.status_code}')
+
+
+@benchmark('image_decode_large')
+def image_decode_large(context):
+    FromBase64ToImg().to_internal_value(context.large_image).close()
+
+
+def percentile(sorted_values, percent):
+    index = max(math.ceil(len(sorted_values) * percent / 100) - 1, 0)
+    return sorted_values[index]
+
+
+def measure(run, context, iterations, warmup):
+    for __ in range(warmup):
+        run(context)
+    timings = []
+    query_counts = []
+    for __ in range(iterations):
+        # The test client resets connection.queries on every request, so
+        # queries are counted with a wrapper instead.
+        queries = QueryRecorder()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter()
+            run(context)
+            timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(queries.count)
+    # Tracing slows everything down, so memory gets a separate run.
+    tracemalloc.start()
+    try:
+        run(context)
+        __, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    timings.sort()
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        # Caches filled on the first iterations make counts differ, the
+        # baseline comparison uses the maximum.
+        'queries': max(query_counts),
+        'queries_min': min(query_counts),
+        'peak_memory_kb': peak // 1024,
+    }
+
+
+def run_benchmarks(names, iterations=20, warmup=2):
+    context = BenchmarkContext()
+    with tempfile.TemporaryDirectory() as media_root:
+        with override_settings(MEDIA_ROOT=media_root, IMAGE_WORKERS=0):
+            return {
+                name: measure(BENCHMARKS[name], context, iterations, warmup)
+                for name in names
+            }
+
+
+def compare_results(baseline, results, tolerance):
+    """Lists scenarios that got slower, heavier or issue more queries."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if result['queries'] > previous['queries']:
+            regressions.append(
+                f'{name}: {previous["queries"]} -> {result["queries"]} '
+                f'queries'
+            )
+        for key in ('p95_ms', 'peak_memory_kb'):
+            if result[key] > previous[key] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: {key} {previous[key]} -> {result[key]}'
+                )
+    return regressions
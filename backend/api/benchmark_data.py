@@ -0,0 +1,234 @@
+import random
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from users.models import Subscription
+
+from .caching import invalidate_reference_cache
+from .counters import recalculate_counters
+from .models import (FavoritRecipe, Ingredient, IngredientForRecipe, Recipe,
+                     ShoppingList, Tag, TagForRecipe)
+from .popularity import refresh_popularity
+
+User = get_user_model()
+
+BENCHMARK_USERNAME_PREFIX = 'bench_user_'
+BENCHMARK_TAG_SLUG_PREFIX = 'bench-tag-'
+BENCHMARK_INGREDIENT_PREFIX = 'bench '
+BENCHMARK_PASSWORD = 'bench-password'
+BATCH_SIZE = 1000
+SYLLABLES = (
+    'ба', 'ва', 'го', 'да', 'ке', 'ли', 'ма', 'но', 'пе', 'ро',
+    'са', 'ту', 'фи', 'ха', 'це', 'чи', 'ша', 'ю', 'я', 'ко',
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+
+
+def get_batch_size():
+    # Django 3.0 does not cap an explicit batch size to SQLite limits.
+    return None if connection.vendor == 'sqlite' else BATCH_SIZE
+
+
+def zipf_weights(count, exponent=1.1):
+    """Cumulative weights where the item of rank r is 1 / r ** exponent."""
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def skewed_sample(rng, population, cum_weights, count):
+    return rng.choices(population, cum_weights=cum_weights, k=count)
+
+
+def benchmark_database_allowed():
+    """Whether this database may be filled with and measured on fakes."""
+    return settings.DEBUG or settings.BENCHMARK_DATABASE
+
+
+def benchmark_users():
+    return User.objects.filter(
+        username__startswith=BENCHMARK_USERNAME_PREFIX
+    )
+
+
+def benchmark_ingredients():
+    return Ingredient.objects.filter(
+        name__startswith=BENCHMARK_INGREDIENT_PREFIX
+    )
+
+
+def create_users(count):
+    password = make_password(BENCHMARK_PASSWORD)
+    User.objects.bulk_create(
+        (User(
+            username=f'{BENCHMARK_USERNAME_PREFIX}{index}',
+            email=f'{BENCHMARK_USERNAME_PREFIX}{index}@example.org',
+            first_name='Bench',
+            last_name=f'User {index}',
+            password=password
+        ) for index in range(count)),
+        batch_size=get_batch_size()
+    )
+    # SQLite does not return primary keys from bulk inserts.
+    return list(
+        benchmark_users().order_by('id').values_list('id', flat=True)
+    )
+
+
+def create_tags(count):
+    Tag.objects.bulk_create(
+        (Tag(
+            name=f'bench tag {index}',
+            color=f'#{index * 2654435 % 0xffffff:06x}',
+            slug=f'{BENCHMARK_TAG_SLUG_PREFIX}{index}'
+        ) for index in range(count)),
+        ignore_conflicts=True
+    )
+    return list(
+        Tag.objects.filter(slug__startswith=BENCHMARK_TAG_SLUG_PREFIX)
+        .values_list('id', flat=True)
+    )
+
+
+def create_ingredients(rng, count):
+    names = set()
+    while len(names) < count:
+        word = ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4)))
+        names.add(f'{word} {len(names)}' if word in names else word)
+    Ingredient.objects.bulk_create(
+        (Ingredient(
+            name=f'{BENCHMARK_INGREDIENT_PREFIX}{name}',
+            measurement_unit=rng.choice(UNITS)
+        ) for name in names),
+        batch_size=get_batch_size(),
+        ignore_conflicts=True
+    )
+    return list(
+        benchmark_ingredients().values_list('id', flat=True)
+    )
+
+
+def create_recipes(rng, user_ids, count):
+    authors = skewed_sample(
+        rng, user_ids, zipf_weights(len(user_ids)), count
+    )
+    Recipe.objects.bulk_create(
+        (Recipe(
+            author_id=author_id,
+            name=f'Bench recipe {index}',
+            text='Benchmark recipe text. ' * rng.randint(1, 10),
+            cooking_time=rng.randint(5, 180),
+            image='recipes/bench.png'
+        ) for index, author_id in enumerate(authors)),
+        batch_size=get_batch_size()
+    )
+    return list(
+        Recipe.objects.filter(author_id__in=user_ids)
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+def create_recipe_links(rng, recipe_ids, tag_ids, ingredient_ids):
+    TagForRecipe.objects.bulk_create(
+        (TagForRecipe(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in recipe_ids
+         for tag_id in rng.sample(tag_ids,
+                                  min(len(tag_ids), rng.randint(1, 3)))),
+        batch_size=get_batch_size()
+    )
+    ingredient_weights = zipf_weights(len(ingredient_ids), 0.8)
+
+    def ingredients():
+        for recipe_id in recipe_ids:
+            for ingredient_id in set(skewed_sample(
+                rng, ingredient_ids, ingredient_weights, rng.randint(3, 12)
+            )):
+                yield IngredientForRecipe(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500)
+                )
+
+    IngredientForRecipe.objects.bulk_create(
+        ingredients(),
+        batch_size=get_batch_size()
+    )
+
+
+def create_pairs(rng, model, first_field, first_ids, second_field,
+                 second_ids, count):
+    """Links skewed users to skewed targets, popular targets first."""
+    first_weights = zipf_weights(len(first_ids), 0.7)
+    second_weights = zipf_weights(len(second_ids))
+    pairs = set(zip(
+        skewed_sample(rng, first_ids, first_weights, count),
+        skewed_sample(rng, second_ids, second_weights, count)
+    ))
+    model.objects.bulk_create(
+        (model(**{first_field: first, second_field: second})
+         for first, second in pairs
+         if first != second or model is not Subscription),
+        batch_size=get_batch_size(),
+        ignore_conflicts=True
+    )
+
+
+@transaction.atomic
+def seed_benchmark(users=1000, recipes=10000, tags=10, ingredients=2000,
+                   favorites=20000, carts=5000, subscriptions=10000,
+                   reader_follows=1000, reader_cart=50, seed=42):
+    """Fills the database with benchmark data.
+
+    The first user is the benchmark reader: it follows `reader_follows`
+    authors and has `reader_cart` recipes in the shopping cart, so the
+    feed and shopping list scenarios have a known heavy case.
+    """
+    rng = random.Random(seed)
+    user_ids = create_users(users)
+    tag_ids = create_tags(tags)
+    ingredient_ids = create_ingredients(rng, ingredients)
+    recipe_ids = create_recipes(rng, user_ids, recipes)
+    create_recipe_links(rng, recipe_ids, tag_ids, ingredient_ids)
+    create_pairs(rng, FavoritRecipe, 'user_id', user_ids,
+                 'recipe_id', recipe_ids, favorites)
+    create_pairs(rng, ShoppingList, 'user_id', user_ids,
+                 'recipe_id', recipe_ids, carts)
+    create_pairs(rng, Subscription, 'user_id', user_ids,
+                 'interesting_author_id', user_ids, subscriptions)
+
+    reader = user_ids[0]
+    Subscription.objects.bulk_create(
+        (Subscription(user_id=reader, interesting_author_id=author_id)
+         for author_id in user_ids[1:reader_follows + 1]),
+        batch_size=get_batch_size(),
+        ignore_conflicts=True
+    )
+    ShoppingList.objects.bulk_create(
+        (ShoppingList(user_id=reader, recipe_id=recipe_id)
+         for recipe_id in rng.sample(recipe_ids,
+                                     min(reader_cart, len(recipe_ids)))),
+        ignore_conflicts=True
+    )
+
+    recalculate_counters()
+    refresh_popularity()
+    invalidate_reference_cache(Tag)
+    invalidate_reference_cache(Ingredient)
+    return {
+        'users': len(user_ids),
+        'recipes': len(recipe_ids),
+        'ingredients': len(ingredient_ids),
+    }
+
+
+@transaction.atomic
+def flush_benchmark():
+    deleted, __ = benchmark_users().delete()
+    Tag.objects.filter(slug__startswith=BENCHMARK_TAG_SLUG_PREFIX).delete()
+    benchmark_ingredients().delete()
+    invalidate_reference_cache(Tag)
+    invalidate_reference_cache(Ingredient)
+    return deleted
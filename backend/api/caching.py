@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+PROCESS_LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def cache_is_process_local():
+    return settings.CACHES['default']['BACKEND'] == PROCESS_LOCAL_CACHE
+
+
+def local_cache_warning():
+    """Explains how long other processes keep data a command changed.
+
+    Versions bumped in a LocMemCache are only seen by the process that
+    bumped them, so the web server serves its own copies until they
+    expire. Returns None for shared caches.
+    """
+    if not cache_is_process_local():
+        return None
+    return (
+        'The cache is local to this process, so the web server keeps '
+        f'serving cached tags and ingredients for up to '
+        f'{settings.REFERENCE_CACHE_TIMEOUT}s, recipes for up to '
+        f'{settings.RECIPE_CACHE_TIMEOUT}s and feeds for up to '
+        f'{settings.FEED_CACHE_TIMEOUT}s. Set CACHE_BACKEND to a shared '
+        'cache to apply changes at once.'
+    )
+
+
+def reference_version_key(model):
+    return f'reference:{model._meta.label_lower}:version'
+
+
+def get_reference_version(model):
+    key = reference_version_key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), settings.REFERENCE_CACHE_TIMEOUT)
+        version = cache.get(key, time.time())
+    return version
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    cache.set(
+        reference_version_key(sender),
+        time.time(),
+        settings.REFERENCE_CACHE_TIMEOUT
+    )
+
+
+class ReferenceCacheMixin:
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def _cached_response(self, view, request, *args, **kwargs):
+        model = self.get_queryset().model
+        version = get_reference_version(model)
+        etag = quote_etag(f'{model._meta.label_lower}-{version}')
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(version)
+        )
+        if response is None:
+            key = (f'{reference_version_key(model)}:{version}:'
+                   f'{request.get_full_path()}')
+            data = cache.get(key)
+            if data is None:
+                data = view(request, *args, **kwargs).data
+                data = list(data) if isinstance(data, list) else dict(data)
+                cache.set(key, data, settings.REFERENCE_CACHE_TIMEOUT)
+            response = Response(data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(int(version))
+        patch_cache_control(response, no_cache=True)
+        return response
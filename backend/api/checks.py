@@ -0,0 +1,35 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .caching import cache_is_process_local
+
+
+@register()
+def check_pdf_font(app_configs, **kwargs):
+    if os.path.isfile(settings.SHOP_LIST_PDF_FONT):
+        return []
+    return [Warning(
+        f'SHOP_LIST_PDF_FONT {settings.SHOP_LIST_PDF_FONT} does not exist, '
+        'so shopping lists can not be downloaded as PDF',
+        hint='Install fonts-dejavu-core or point SHOP_LIST_PDF_FONT to a '
+             'TrueType font with Cyrillic glyphs.',
+        id='api.W002',
+    )]
+
+
+@register(deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not cache_is_process_local():
+        return []
+    return [Warning(
+        'The default cache is LocMemCache, so changes made by other gunicorn '
+        'workers and by management commands show up only after the cache '
+        'timeouts expire',
+        hint='Set CACHE_BACKEND to '
+             'django.core.cache.backends.db.DatabaseCache and CACHE_LOCATION '
+             'to a table made by createcachetable, or to a Memcached backend '
+             'and the address of the server.',
+        id='api.W001',
+    )]
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from users.models import Subscription
+
+from .models import FavoritRecipe, Recipe, ShoppingList
+
+User = get_user_model()
+
+
+def decrement(field, value=1):
+    # Rows created outside the API (admin, shell, fixtures) are not
+    # counted, so a decrement must not go below zero.
+    return Greatest(F(field) - value, 0)
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+@transaction.atomic
+def recalculate_counters():
+    recipes = Recipe.objects.update(
+        favorites_count=count_related(FavoritRecipe, 'recipe'),
+        shopping_carts_count=count_related(ShoppingList, 'recipe')
+    )
+    users = User.objects.update(
+        recipes_count=count_related(Recipe, 'author'),
+        followers_count=count_related(Subscription, 'interesting_author')
+    )
+    return recipes, users
@@ -0,0 +1,110 @@
+import csv
+import io
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFError, TTFont
+from reportlab.pdfgen import canvas
+
+# check raises ImproperlyConfigured before the response starts if the
+# format can not be rendered on this installation.
+Exporter = namedtuple(
+    'Exporter',
+    ('render', 'content_type', 'extension', 'check'),
+    defaults=(None,)
+)
+
+SHOP_LIST_EXPORTERS = {}
+
+
+def shop_list_exporter(name, content_type, check=None):
+    def register(render):
+        SHOP_LIST_EXPORTERS[name] = Exporter(
+            render, content_type, name, check
+        )
+        return render
+    return register
+
+
+@shop_list_exporter('txt', 'text/plain')
+def render_txt(rows):
+    for name, measurement_unit, amount in rows:
+        yield f'{name} - {amount}({measurement_unit})\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+@shop_list_exporter('csv', 'text/csv')
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow(row)
+
+
+@shop_list_exporter('json', 'application/json')
+def render_json(rows):
+    separator = '['
+    for name, measurement_unit, amount in rows:
+        yield separator + json.dumps(
+            {'name': name,
+             'measurement_unit': measurement_unit,
+             'amount': amount},
+            ensure_ascii=False
+        )
+        separator = ','
+    yield '[]' if separator == '[' else ']'
+
+
+PDF_FONT_NAME = 'ShopListFont'
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 14
+PDF_LINE_HEIGHT = 22
+
+
+def get_pdf_font():
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        try:
+            pdfmetrics.registerFont(
+                TTFont(PDF_FONT_NAME, settings.SHOP_LIST_PDF_FONT)
+            )
+        except (OSError, TTFError) as error:
+            raise ImproperlyConfigured(
+                f'SHOP_LIST_PDF_FONT can not be loaded: {error}'
+            )
+    return PDF_FONT_NAME
+
+
+@shop_list_exporter('pdf', 'application/pdf', check=get_pdf_font)
+def render_pdf(rows):
+    """Renders the list as a PDF with the font embedded as a subset.
+
+    Unlike the other formats the PDF is built in memory and sent at once:
+    reportlab writes the document only on save(), and the font subset
+    and the cross-reference table with the byte offsets of every object
+    are only known after the last page. The list has one line per
+    distinct ingredient in the cart, so the document stays small.
+    """
+    font = get_pdf_font()
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    width, height = A4
+    top = height - PDF_MARGIN
+    line = top
+    pdf.setFont(font, PDF_FONT_SIZE)
+    for text in render_txt(rows):
+        if line < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font, PDF_FONT_SIZE)
+            line = top
+        pdf.drawString(PDF_MARGIN, line, text.rstrip('\n'))
+        line -= PDF_LINE_HEIGHT
+    pdf.save()
+    yield buffer.getvalue()
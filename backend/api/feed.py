@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import Subscription
+
+
+def feed_cache_key(user_id):
+    return f'feed:{user_id}'
+
+
+def get_feed_timeline(user, queryset):
+    key = feed_cache_key(user.pk)
+    timeline = cache.get(key)
+    if timeline is None:
+        ids = list(
+            queryset.order_by('-pub_date', '-id')
+            .values_list('id', flat=True)[:settings.FEED_CACHE_SIZE]
+        )
+        timeline = (ids, len(ids) < settings.FEED_CACHE_SIZE)
+        cache.set(key, timeline, settings.FEED_CACHE_TIMEOUT)
+    return timeline
+
+
+def invalidate_feed(user_id):
+    transaction.on_commit(lambda: cache.delete(feed_cache_key(user_id)))
+
+
+def invalidate_followers_feeds(author_id):
+    followers = Subscription.objects.filter(
+        interesting_author_id=author_id
+    ).values_list('user_id', flat=True)
+    transaction.on_commit(lambda: cache.delete_many(
+        [feed_cache_key(user_id) for user_id in followers.iterator()]
+    ))
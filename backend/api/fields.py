@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+
+class RenditionsField(serializers.Field):
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, renditions):
+        request = self.context.get('request')
+        data = {}
+        for rendition in renditions.all():
+            url = rendition.image.url
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            data.setdefault(rendition.size, {})[rendition.format] = url
+        return data
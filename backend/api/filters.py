@@ -1,7 +1,10 @@
 import django_filters
+from django.db.models import Case, Exists, IntegerField, OuterRef, Value, When
 from django_filters.rest_framework import FilterSet
 
-from .models import Ingredient, Recipe, Tag
+from .memberships import get_memberships
+from .models import (FavoritRecipe, Ingredient, IngredientForRecipe, Recipe,
+                     ShoppingList, Tag)
 
 
 class IngredientFilter(FilterSet):
@@ -22,13 +25,17 @@ class RecipeFilter(FilterSet):
         queryset=Tag.objects.all(),
     )
     is_favorited = django_filters.BooleanFilter(
-        field_name='is_favorite_for_users',
+        field_name='is_favorited',
         method='get_is_favorite'
     )
     is_in_shopping_cart = django_filters.BooleanFilter(
-        field_name='is_in_shopping_list',
+        field_name='is_in_shopping_cart',
         method='get_is_in_shopping_list'
     )
+    search = django_filters.CharFilter(method='get_search')
+    ordering = django_filters.OrderingFilter(
+        fields=('favorites_count', 'pub_date')
+    )
 
     class Meta:
         model = Recipe
@@ -36,14 +43,40 @@ class RecipeFilter(FilterSet):
 
     def get_is_favorite(self, queryset, name, value):
         if value:
-            recipes_in_favorits = '__'.join([name, 'user'])
-            return queryset.filter(**{recipes_in_favorits: self.request.user})
+            return queryset.filter(
+                pk__in=get_memberships(self.request, FavoritRecipe)
+            )
         return queryset
 
     def get_is_in_shopping_list(self, queryset, name, value):
         if value:
-            recipes_in_shopping_list = '__'.join([name, 'user'])
             return queryset.filter(
-                **{recipes_in_shopping_list: self.request.user}
+                pk__in=get_memberships(self.request, ShoppingList)
             )
         return queryset
+
+    def get_search(self, queryset, name, value):
+        # Each part of the union is served by its own trigram index, an OR
+        # of the conditions makes PostgreSQL scan all recipes instead.
+        matching_ids = Recipe.objects.filter(
+            name__icontains=value
+        ).order_by().values('pk').union(
+            Recipe.objects.filter(text__icontains=value)
+            .order_by().values('pk'),
+            IngredientForRecipe.objects.filter(
+                ingredient__name__icontains=value
+            ).order_by().values('recipe_id')
+        )
+        in_ingredients = Exists(IngredientForRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+            ingredient__name__icontains=value
+        ))
+        return queryset.filter(pk__in=matching_ids).annotate(
+            search_rank=Case(
+                When(name__istartswith=value, then=Value(3)),
+                When(name__icontains=value, then=Value(2)),
+                When(in_ingredients, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        ).order_by('-search_rank', '-pub_date', '-id')
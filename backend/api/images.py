@@ -0,0 +1,283 @@
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+from .models import ImageJob, ImageRendition, Recipe
+from .recipe_cache import invalidate_recipe_cache
+
+logger = logging.getLogger(__name__)
+
+RENDITION_SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {
+        'format': 'JPEG',
+        'quality': 85,
+        'optimize': True,
+        'progressive': True,
+    },
+}
+# Originals are saved again in their own format with only the pixels and
+# the orientation, JPEG with its original quantization tables.
+ORIGINAL_SAVE_OPTIONS = {
+    'JPEG': {
+        'quality': 'keep',
+        'subsampling': 'keep',
+        'qtables': 'keep',
+        'comment': b'',
+    },
+    'PNG': {},
+    'GIF': {'comment': b''},
+    'WEBP': {'quality': 90},
+}
+# Image.info keys that say nothing about the author or the camera.
+# Originals with only these and no EXIF are kept byte for byte.
+PLAIN_IMAGE_INFO = {
+    'adobe', 'adobe_transform', 'aspect', 'background', 'chromaticity',
+    'dpi', 'duration', 'gamma', 'icc_profile', 'interlace', 'jfif',
+    'jfif_density', 'jfif_unit', 'jfif_version', 'loop', 'progression',
+    'progressive', 'srgb', 'timestamp', 'transparency', 'version',
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_WORKERS,
+                    thread_name_prefix='images'
+                )
+    return _executor
+
+
+def enqueue_image_processing(recipe):
+    job = ImageJob.objects.create(recipe=recipe, image=recipe.image.name)
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_image_job, job.pk)
+        )
+    return job
+
+
+def run_image_job(job_id):
+    try:
+        process_image_job(job_id)
+    except Exception:
+        logger.exception('Image job %s crashed', job_id)
+    finally:
+        connections.close_all()
+
+
+def open_image(image_file):
+    image = Image.open(image_file)
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def is_lossless_webp(file):
+    """Whether the first frame of a WebP file is VP8L coded."""
+    file.seek(12)
+    while True:
+        header = file.read(8)
+        if len(header) < 8:
+            return False
+        fourcc = header[:4]
+        if fourcc == b'VP8L':
+            return True
+        if fourcc == b'VP8 ':
+            return False
+        if fourcc == b'ANMF':
+            # The frame chunks follow the 16-byte frame header.
+            file.seek(16, os.SEEK_CUR)
+            continue
+        size = int.from_bytes(header[4:], 'little')
+        file.seek(size + size % 2, os.SEEK_CUR)
+
+
+def strip_metadata(source, target):
+    """Writes the image from source to target without EXIF (GPS, camera),
+    XMP and comments.
+
+    Returns False without writing anything if the image has none of them.
+    """
+    lossless = is_lossless_webp(source)
+    source.seek(0)
+    with Image.open(source) as image:
+        if image.format not in ORIGINAL_SAVE_OPTIONS:
+            raise ValueError(f'Unsupported image format {image.format}')
+        # PNG text chunks after the pixels are only read by load().
+        image.load()
+        if (not image.getexif()
+                and image.info.keys() <= PLAIN_IMAGE_INFO):
+            return False
+        options = dict(ORIGINAL_SAVE_OPTIONS[image.format])
+        if image.format == 'WEBP' and lossless:
+            options['lossless'] = True
+        orientation = image.getexif().get(ExifTags.Base.Orientation)
+        if orientation and image.format != 'GIF':
+            exif = Image.Exif()
+            exif[ExifTags.Base.Orientation] = orientation
+            options['exif'] = exif.tobytes()
+        if getattr(image, 'is_animated', False):
+            options['save_all'] = True
+        image.save(target, image.format, **options)
+    return True
+
+
+def strip_original(recipe):
+    """Saves the recipe image again without metadata.
+
+    Returns the name of the new file, or None if there was nothing to
+    strip.
+    """
+    buffer = BytesIO()
+    with recipe.image.open('rb'):
+        if not strip_metadata(recipe.image, buffer):
+            return None
+    extension = posixpath.splitext(recipe.image.name)[1]
+    name = recipe.image.field.generate_filename(recipe, f'image{extension}')
+    return recipe.image.storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def discard_original(recipe, name):
+    # Content-addressed blobs may be shared by other recipes, cleanup_media
+    # deletes them once nothing refers to them.
+    if not settings.CONTENT_ADDRESSED_IMAGES:
+        recipe.image.storage.delete(name)
+
+
+def render_renditions(image_file):
+    with image_file.open('rb'):
+        Image.open(image_file).verify()
+    with image_file.open('rb'):
+        image = open_image(image_file)
+    renditions = []
+    for size, width in settings.IMAGE_RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail((width, width), Image.LANCZOS)
+        for image_format in settings.IMAGE_RENDITION_FORMATS:
+            # Only the pixels are saved, so EXIF (GPS, camera) is dropped.
+            buffer = BytesIO()
+            rendition.save(buffer, **RENDITION_SAVE_OPTIONS[image_format])
+            renditions.append(ImageRendition(
+                size=size,
+                format=image_format,
+                image=ContentFile(
+                    buffer.getvalue(),
+                    name=f'{size}.{image_format}'
+                )
+            ))
+    return renditions
+
+
+def claim_image_job(job_id):
+    return ImageJob.objects.filter(
+        pk=job_id,
+        status=ImageJob.PENDING
+    ).update(
+        status=ImageJob.PROCESSING,
+        attempts=F('attempts') + 1,
+        updated=timezone.now()
+    ) == 1
+
+
+def finish_image_job(job, status, error=''):
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status,
+        error=error,
+        updated=timezone.now()
+    )
+
+
+def save_job_results(job, renditions, stripped):
+    """Replaces the renditions and the original if the job is still actual.
+
+    Otherwise deletes the files the job produced.
+    """
+    for rendition in renditions:
+        rendition.recipe = job.recipe
+        rendition.image.save(
+            rendition.image.name,
+            rendition.image.file,
+            save=False
+        )
+    with transaction.atomic():
+        actual = Recipe.objects.select_for_update().filter(
+            pk=job.recipe_id,
+            image=job.image
+        ).exists()
+        if actual:
+            replaced = list(job.recipe.renditions.all())
+            ImageRendition.objects.filter(recipe=job.recipe).delete()
+            ImageRendition.objects.bulk_create(renditions)
+            if stripped:
+                Recipe.objects.filter(pk=job.recipe_id).update(image=stripped)
+            invalidate_recipe_cache(job.recipe_id)
+        else:
+            replaced = renditions
+    for rendition in replaced:
+        rendition.image.delete(save=False)
+    if stripped:
+        discard_original(job.recipe, job.image if actual else stripped)
+    return actual
+
+
+def process_image_job(job_id):
+    if not claim_image_job(job_id):
+        return False
+    job = ImageJob.objects.select_related('recipe').get(pk=job_id)
+    if job.recipe.image.name != job.image:
+        finish_image_job(job, ImageJob.DONE, 'Superseded by a newer image')
+        return False
+    try:
+        renditions = render_renditions(job.recipe.image)
+        stripped = strip_original(job.recipe)
+    except (UnidentifiedImageError, Image.DecompressionBombError,
+            SyntaxError, ValueError) as error:
+        # Renditions of the previous image no longer match the recipe.
+        for rendition in job.recipe.renditions.all():
+            rendition.image.delete(save=False)
+            rendition.delete()
+        invalidate_recipe_cache(job.recipe_id)
+        finish_image_job(job, ImageJob.FAILED, f'Invalid image: {error}')
+        return False
+    except OSError as error:
+        status = (ImageJob.FAILED
+                  if job.attempts >= settings.IMAGE_JOB_MAX_ATTEMPTS
+                  else ImageJob.PENDING)
+        finish_image_job(job, status, str(error))
+        return False
+
+    actual = save_job_results(job, renditions, stripped)
+    finish_image_job(
+        job,
+        ImageJob.DONE,
+        '' if actual else 'Superseded by a newer image'
+    )
+    return actual
+
+
+def reset_stale_image_jobs():
+    return ImageJob.objects.filter(
+        status=ImageJob.PROCESSING,
+        updated__lt=timezone.now() - settings.IMAGE_JOB_TIMEOUT
+    ).update(status=ImageJob.PENDING, updated=timezone.now())
@@ -0,0 +1,188 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from django.db import connection, transaction
+
+from .caching import invalidate_reference_cache
+from .models import Ingredient
+
+JSON_READ_SIZE = 64 * 1024
+NAME_MAX_LENGTH = Ingredient._meta.get_field('name').max_length
+UNIT_MAX_LENGTH = Ingredient._meta.get_field('measurement_unit').max_length
+
+
+def skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+        position += 1
+    return position
+
+
+def iter_json_array(file):
+    decoder = json.JSONDecoder()
+    chunk = buffer = file.read(JSON_READ_SIZE)
+    position = skip_separators(buffer, 0)
+    if not buffer.startswith('[', position):
+        raise ValueError('Expected a JSON array')
+    position += 1
+    while chunk:
+        position = skip_separators(buffer, position)
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = file.read(JSON_READ_SIZE)
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+    raise ValueError('Unexpected end of JSON array')
+
+
+def read_json(file):
+    for item in iter_json_array(file):
+        if isinstance(item, dict):
+            yield item.get('name'), item.get('measurement_unit')
+        else:
+            yield None, None
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row == ['name', 'measurement_unit']:
+            continue
+        if len(row) == 2:
+            yield row[0], row[1]
+        else:
+            yield None, None
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def clean_rows(rows, stats):
+    for name, measurement_unit in rows:
+        stats['read'] += 1
+        if not isinstance(name, str) or not isinstance(measurement_unit, str):
+            stats['skipped'] += 1
+            continue
+        name, measurement_unit = name.strip(), measurement_unit.strip()
+        if (not name
+                or len(name) > NAME_MAX_LENGTH
+                or len(measurement_unit) > UNIT_MAX_LENGTH):
+            stats['skipped'] += 1
+            continue
+        yield name, measurement_unit
+
+
+def upsert_batch(batch, stats):
+    # Later rows win, as they would with one save() per row.
+    units = dict(batch)
+    existing = {
+        ingredient.name: ingredient
+        for ingredient in Ingredient.objects.filter(name__in=units)
+    }
+    changed = []
+    for name, ingredient in existing.items():
+        if ingredient.measurement_unit != units[name]:
+            ingredient.measurement_unit = units[name]
+            changed.append(ingredient)
+    Ingredient.objects.bulk_update(changed, ['measurement_unit'])
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=name, measurement_unit=measurement_unit)
+         for name, measurement_unit in units.items()
+         if name not in existing),
+        ignore_conflicts=True
+    )
+    stats['created'] += len(units) - len(existing)
+    stats['updated'] += len(changed)
+
+
+def import_in_batches(rows, batch_size, stats):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        with transaction.atomic():
+            upsert_batch(batch, stats)
+
+
+class CsvRowsReader(io.RawIOBase):
+    def __init__(self, rows):
+        self._lines = self._encode(rows)
+        self._buffer = b''
+
+    def _encode(self, rows):
+        line = io.StringIO()
+        writer = csv.writer(line)
+        for row in rows:
+            writer.writerow(row)
+            yield line.getvalue().encode()
+            line.seek(0)
+            line.truncate()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buffer)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+@transaction.atomic
+def import_with_copy(rows, stats):
+    table = Ingredient._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMPORARY TABLE ingredient_import ('
+            ' position serial,'
+            f' name varchar({NAME_MAX_LENGTH}),'
+            f' measurement_unit varchar({UNIT_MAX_LENGTH})'
+            ') ON COMMIT DROP'
+        )
+        # csv.writer leaves empty strings unquoted, which COPY would read
+        # as NULL.
+        cursor.copy_expert(
+            'COPY ingredient_import (name, measurement_unit) '
+            'FROM STDIN WITH (FORMAT csv, '
+            'FORCE_NOT_NULL (name, measurement_unit))',
+            CsvRowsReader(rows)
+        )
+        # Later rows win, as they would with one save() per row.
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit) '
+            'SELECT DISTINCT ON (name) name, measurement_unit '
+            'FROM ingredient_import ORDER BY name, position DESC '
+            'ON CONFLICT (name) DO UPDATE '
+            'SET measurement_unit = EXCLUDED.measurement_unit '
+            f'WHERE {table}.measurement_unit '
+            'IS DISTINCT FROM EXCLUDED.measurement_unit '
+            'RETURNING xmax = 0'
+        )
+        for created, in cursor:
+            stats['created' if created else 'updated'] += 1
+
+
+def import_ingredients(file, file_format, batch_size=5000, use_copy=True):
+    stats = dict.fromkeys(('read', 'skipped', 'created', 'updated'), 0)
+    rows = clean_rows(READERS[file_format](file), stats)
+    if use_copy and connection.vendor == 'postgresql':
+        import_with_copy(rows, stats)
+    else:
+        import_in_batches(rows, batch_size, stats)
+    # Bulk queries send no post_save signals, so the cached ingredient
+    # list and the autocomplete index are invalidated here.
+    invalidate_reference_cache(Ingredient)
+    return stats
@@ -0,0 +1,51 @@
+import threading
+from bisect import bisect_left
+
+from .caching import get_reference_version
+from .models import Ingredient
+
+
+class IngredientPrefixIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._rows = []
+        self._names = []
+        self._keys = []
+        self._ranks = []
+
+    def _build(self, version):
+        rows = list(
+            Ingredient.objects.values('id', 'name', 'measurement_unit')
+            .order_by('name')
+        )
+        names = [row['name'].lower() for row in rows]
+        entries = sorted((name, rank) for rank, name in enumerate(names))
+        self._rows = rows
+        self._names = names
+        self._keys = [name for name, __ in entries]
+        self._ranks = [rank for __, rank in entries]
+        self._version = version
+
+    def _actual(self):
+        version = get_reference_version(Ingredient)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._build(version)
+        return self._rows, self._names, self._keys, self._ranks
+
+    def search(self, name):
+        rows, names, keys, ranks = self._actual()
+        prefix = name.lower()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10ffff), start)
+        if start < end:
+            return [rows[rank] for rank in sorted(ranks[start:end])]
+        # Substrings only when nothing starts with the name: a single
+        # letter would otherwise return most of the unpaginated list.
+        return [row for row, row_name in zip(rows, names)
+                if prefix in row_name]
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import ImageRendition, Recipe
+from api.storage import iter_storage_files
+
+
+class Command(BaseCommand):
+    help = 'Deletes recipe images that no recipe or rendition refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24,
+            help='Keep files modified less than MIN_AGE hours ago'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only list the files that would be deleted'
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        referenced = set(
+            Recipe.objects.exclude(image='').filter(image__isnull=False)
+            .values_list('image', flat=True).iterator()
+        )
+        referenced.update(
+            ImageRendition.objects.values_list('image', flat=True).iterator()
+        )
+        # Files of uploads whose transaction is still open are not
+        # referenced yet, so only old enough files are removed.
+        threshold = timezone.now() - timedelta(hours=options['min_age'])
+        deleted = 0
+        if not storage.exists('recipes'):
+            return
+        for name in iter_storage_files(storage, 'recipes'):
+            if name in referenced:
+                continue
+            if storage.get_modified_time(name) > threshold:
+                continue
+            # A shared blob may have been referenced again since the
+            # references were read.
+            if (Recipe.objects.filter(image=name).exists()
+                    or ImageRendition.objects.filter(image=name).exists()):
+                continue
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Found" if options["dry_run"] else "Deleted"} '
+            f'{deleted} orphaned files'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Recipe
+from api.recipe_transfer import TRANSFER_CHUNK_SIZE, export_recipe_lines
+
+
+class Command(BaseCommand):
+    help = 'Writes all recipes to stdout as NDJSON, one recipe per line'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=TRANSFER_CHUNK_SIZE,
+            help='Recipes fetched from the database at a time'
+        )
+
+    def handle(self, *args, **options):
+        for line in export_recipe_lines(
+            Recipe.objects.all(),
+            chunk_size=options['chunk_size']
+        ):
+            self.stdout.write(line, ending='')
@@ -0,0 +1,73 @@
+import io
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.caching import local_cache_warning
+from api.ingredient_import import READERS, import_ingredients
+
+
+class Command(BaseCommand):
+    help = ('Imports ingredients from a CSV (name,measurement_unit) or '
+            'JSON file, updating the units of existing ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File path, or - for stdin')
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='File format, taken from the extension by default'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per transaction when COPY is not used'
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use batched inserts even on PostgreSQL'
+        )
+
+    def handle(self, *args, **options):
+        file_format = (options['format']
+                       or os.path.splitext(options['path'])[1].lstrip('.'))
+        if file_format not in READERS:
+            raise CommandError(
+                f'Unknown format "{file_format}", use --format'
+            )
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be a positive integer')
+        started = time.monotonic()
+        try:
+            with self.open(options['path']) as file:
+                stats = import_ingredients(
+                    file,
+                    file_format,
+                    batch_size=options['batch_size'],
+                    use_copy=not options['no_copy']
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {stats["read"]} rows in {elapsed:.2f}s '
+            f'({stats["read"] / max(elapsed, 1e-6):.0f} rows/s): '
+            f'{stats["created"]} created, {stats["updated"]} updated, '
+            f'{stats["skipped"]} skipped'
+        ))
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(
+                sys.stdin.buffer,
+                encoding='utf-8',
+                newline=''
+            )
+        return open(path, encoding='utf-8', newline='')
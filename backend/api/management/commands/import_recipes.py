@@ -0,0 +1,65 @@
+import io
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.caching import local_cache_warning
+from api.recipe_transfer import TRANSFER_CHUNK_SIZE, import_recipe_lines
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Imports recipes from an NDJSON file, one recipe per line as '
+            'written by export_recipes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File path, or - for stdin')
+        parser.add_argument(
+            '--author',
+            help='Email of the author for lines without one'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=TRANSFER_CHUNK_SIZE,
+            help='Recipes per transaction'
+        )
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(email=options['author']).first()
+            if author is None:
+                raise CommandError(f'No user with email {options["author"]}')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+        created = failed = 0
+        try:
+            with self.open(options['path']) as file:
+                for result in import_recipe_lines(
+                    file,
+                    author,
+                    chunk_size=options['chunk_size']
+                ):
+                    if 'id' in result:
+                        created += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(
+                            f'Line {result["line"]}: {result["errors"]}'
+                        )
+        except OSError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} recipes, {failed} failed'
+        ))
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+        return open(path, encoding='utf-8')
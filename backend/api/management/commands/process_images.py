@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.caching import local_cache_warning
+from api.images import process_image_job, reset_stale_image_jobs
+from api.models import ImageJob, Recipe
+
+
+class Command(BaseCommand):
+    help = ('Builds recipe image renditions for jobs the web workers '
+            'did not finish')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--enqueue-missing',
+            action='store_true',
+            help='Create jobs for recipe images that have no renditions'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep polling for new jobs every INTERVAL seconds'
+        )
+
+    def handle(self, *args, **options):
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
+        if options['enqueue_missing']:
+            recipes = Recipe.objects.exclude(image='').filter(
+                image__isnull=False,
+                renditions__isnull=True
+            ).exclude(image_jobs__status__in=(
+                ImageJob.PENDING, ImageJob.PROCESSING
+            )).distinct()
+            for recipe in recipes.iterator():
+                ImageJob.objects.create(recipe=recipe, image=recipe.image.name)
+        while True:
+            self.process_pending()
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def process_pending(self):
+        reset_stale_image_jobs()
+        job_ids = ImageJob.objects.filter(
+            status=ImageJob.PENDING
+        ).values_list('id', flat=True)
+        processed = sum(
+            process_image_job(job_id) for job_id in list(job_ids)
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Built renditions for {processed} recipe images'
+        ))
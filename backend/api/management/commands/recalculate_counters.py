@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import recalculate_counters
+
+
+class Command(BaseCommand):
+    help = ('Recalculates favorites, shopping carts, recipes and followers '
+            'counters from the link tables')
+
+    def handle(self, *args, **options):
+        recipes, users = recalculate_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Counters updated for {recipes} recipes and {users} users'
+        ))
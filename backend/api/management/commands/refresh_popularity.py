@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = ('Adds favorites and shopping cart links created since the '
+            'previous run to the popular recipes ranking')
+
+    def handle(self, *args, **options):
+        events, recipes = refresh_popularity()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {events} new links for {recipes} recipes'
+        ))
@@ -0,0 +1,104 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.benchmark import (BENCHMARKS, BenchmarkError, compare_results,
+                           run_benchmarks)
+from api.benchmark_data import benchmark_database_allowed
+
+
+class Command(BaseCommand):
+    help = ('Measures latency, query counts and peak memory of the API hot '
+            'paths on data created by seed_benchmark')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=sorted(BENCHMARKS),
+            help='Run only this scenario, can be repeated'
+        )
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Fail if results are worse than in this JSON file'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed relative growth of p95 latency and peak memory'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run even if neither DEBUG nor BENCHMARK_DATABASE is set'
+        )
+
+    def handle(self, *args, **options):
+        if not (options['force'] or benchmark_database_allowed()):
+            raise CommandError(
+                'Refusing to run outside a benchmark database: set DEBUG or '
+                'BENCHMARK_DATABASE=true, or pass --force'
+            )
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('Need at least one iteration')
+        baseline = self.load_baseline(options['compare'])
+        try:
+            results = run_benchmarks(
+                options['scenario'] or list(BENCHMARKS),
+                iterations=options['iterations'],
+                warmup=options['warmup']
+            )
+        except BenchmarkError as error:
+            raise CommandError(error)
+
+        self.write_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({
+                    'created': timezone.now().isoformat(),
+                    'iterations': options['iterations'],
+                    'results': results,
+                }, file, indent=2)
+        if baseline is not None:
+            regressions = compare_results(
+                baseline,
+                results,
+                options['tolerance']
+            )
+            if regressions:
+                raise CommandError(
+                    'Regressions against the baseline:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def load_baseline(self, path):
+        if not path:
+            return None
+        try:
+            with open(path) as file:
+                return json.load(file)['results']
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Can not read baseline: {error}')
+
+    def write_table(self, results):
+        self.stdout.write(
+            f'{"scenario":34} {"p50 ms":>9} {"p95 ms":>9} '
+            f'{"queries":>8} {"peak KB":>9}'
+        )
+        for name, result in results.items():
+            queries = str(result['queries'])
+            if result['queries_min'] != result['queries']:
+                queries = f'{result["queries_min"]}-{queries}'
+            self.stdout.write(
+                f'{name:34} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{queries:>8} {result["peak_memory_kb"]:>9}'
+            )
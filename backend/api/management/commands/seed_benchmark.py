@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark_data import (benchmark_database_allowed, benchmark_users,
+                                flush_benchmark, seed_benchmark)
+from api.caching import local_cache_warning
+
+
+class Command(BaseCommand):
+    help = ('Fills the database with skewed synthetic users, recipes and '
+            'links for run_benchmark')
+
+    def add_arguments(self, parser):
+        for name, default in (
+            ('users', 1000),
+            ('recipes', 10000),
+            ('tags', 10),
+            ('ingredients', 2000),
+            ('favorites', 20000),
+            ('carts', 5000),
+            ('subscriptions', 10000),
+            ('reader-follows', 1000),
+            ('reader-cart', 50),
+            ('seed', 42),
+        ):
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument(
+            '--flush',
+            action='store_true',
+            help='Delete the previously seeded benchmark data first'
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Run even if neither DEBUG nor BENCHMARK_DATABASE is set'
+        )
+
+    def handle(self, *args, **options):
+        if not (options['force'] or benchmark_database_allowed()):
+            raise CommandError(
+                'Refusing to run outside a benchmark database: set DEBUG or '
+                'BENCHMARK_DATABASE=true, or pass --force'
+            )
+        if options['flush']:
+            flush_benchmark()
+        elif benchmark_users().exists():
+            raise CommandError(
+                'Benchmark data already exists, use --flush to recreate it'
+            )
+        if (options['users'] < 2 or options['recipes'] < 1
+                or options['tags'] < 1 or options['ingredients'] < 1):
+            raise CommandError(
+                'Need at least 2 users and 1 recipe, tag and ingredient'
+            )
+        started = time.monotonic()
+        created = seed_benchmark(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            reader_follows=options['reader_follows'],
+            reader_cart=options['reader_cart'],
+            seed=options['seed']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created["users"]} users and {created["recipes"]} '
+            f'recipes with {created["ingredients"]} ingredients in '
+            f'{time.monotonic() - started:.1f}s'
+        ))
+        warning = local_cache_warning()
+        if warning:
+            self.stderr.write(self.style.WARNING(warning))
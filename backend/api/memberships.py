@@ -0,0 +1,106 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import Subscription
+
+from .models import FavoritRecipe, ShoppingList
+
+MEMBER_FIELDS = {
+    FavoritRecipe: 'recipe_id',
+    ShoppingList: 'recipe_id',
+    Subscription: 'interesting_author_id',
+}
+
+
+def membership_version_key(user_id, model):
+    return f'memberships:{user_id}:{model._meta.label_lower}:version'
+
+
+def membership_key(user_id, model, version):
+    return f'memberships:{user_id}:{model._meta.label_lower}:{version}'
+
+
+def get_memberships(request, model):
+    """Ids of the recipes or authors the request's user linked with model.
+
+    Every set is read from the cache at most once per request.
+    """
+    if not request.user.is_authenticated:
+        return frozenset()
+    if not hasattr(request, '_memberships'):
+        request._memberships = {}
+    if model not in request._memberships:
+        request._memberships[model] = load_memberships(request.user.pk, model)
+    return request._memberships[model]
+
+
+def load_memberships(user_id, model):
+    version = None
+    if settings.MEMBERSHIP_CACHE_TIMEOUT:
+        version_key = membership_version_key(user_id, model)
+        version = cache.get(version_key)
+        if version is None:
+            # A new version never matches a set left from an evicted one.
+            cache.add(
+                version_key,
+                int(time.time() * 1000),
+                settings.MEMBERSHIP_CACHE_TIMEOUT
+            )
+            version = cache.get(version_key)
+    if version is not None:
+        members = cache.get(membership_key(user_id, model, version))
+        if members is not None:
+            return members
+    members = frozenset(
+        model.objects.filter(user_id=user_id)
+        .values_list(MEMBER_FIELDS[model], flat=True)
+    )
+    if version is not None:
+        cache.set(
+            membership_key(user_id, model, version),
+            members,
+            settings.MEMBERSHIP_CACHE_TIMEOUT
+        )
+    return members
+
+
+def change_memberships(user_id, model, member_id, added):
+    """Moves the cached set to a new version with member_id added or not.
+
+    If another write took a version in between, the new version is left
+    empty and the next read loads the set from the database.
+    """
+    version_key = membership_version_key(user_id, model)
+    version = cache.get(version_key)
+    if version is None:
+        return
+    members = cache.get(membership_key(user_id, model, version))
+    try:
+        new_version = cache.incr(version_key)
+    except ValueError:
+        return
+    if members is not None and new_version == version + 1:
+        cache.set(
+            membership_key(user_id, model, new_version),
+            members | {member_id} if added else members - {member_id},
+            settings.MEMBERSHIP_CACHE_TIMEOUT
+        )
+
+
+def update_memberships(link, added):
+    model = type(link)
+    transaction.on_commit(lambda: change_memberships(
+        link.user_id,
+        model,
+        getattr(link, MEMBER_FIELDS[model]),
+        added
+    ))
+
+
+def invalidate_memberships(user_id, model):
+    transaction.on_commit(
+        lambda: cache.delete(membership_version_key(user_id, model))
+    )
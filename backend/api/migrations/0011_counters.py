@@ -0,0 +1,57 @@
+# Generated by Django 3.0.5 on 2026-10-18 04:06
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    recipe = apps.get_model('api', 'Recipe')
+    favorite_recipe = apps.get_model('api', 'FavoritRecipe')
+    shopping_list = apps.get_model('api', 'ShoppingList')
+    user = apps.get_model('users', 'CustomUser')
+    subscription = apps.get_model('users', 'Subscription')
+    recipe.objects.update(
+        favorites_count=count_related(favorite_recipe, 'recipe'),
+        shopping_carts_count=count_related(shopping_list, 'recipe')
+    )
+    user.objects.update(
+        recipes_count=count_related(recipe, 'author'),
+        followers_count=count_related(subscription, 'interesting_author')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_recipe_pub_date_id_idx'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
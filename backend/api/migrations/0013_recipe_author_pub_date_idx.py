@@ -0,0 +1,17 @@
+# Generated by Django 3.0.5 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.0.5 on 2026-10-18 04:11
+
+import api.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_recipe_author_pub_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(max_length=20)),
+                ('format', models.CharField(max_length=10)),
+                ('image', models.ImageField(upload_to=api.models.rendition_path)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='api.Recipe')),
+            ],
+            options={
+                'ordering': ['recipe', 'size', 'format'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('processing', 'processing'), ('done', 'done'), ('failed', 'failed')], db_index=True, default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_jobs', to='api.Recipe')),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagerendition',
+            constraint=models.UniqueConstraint(fields=('recipe', 'size', 'format'), name='unique_rendition'),
+        ),
+    ]
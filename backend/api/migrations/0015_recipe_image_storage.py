@@ -0,0 +1,20 @@
+# Generated by Django 3.0.5 on 2026-10-18 04:13
+
+import api.serve_functions
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=api.storage.RecipeImageStorage(), upload_to=api.serve_functions.rename_with_date),
+        ),
+    ]
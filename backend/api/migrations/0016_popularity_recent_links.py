@@ -0,0 +1,18 @@
+# Generated by Django 3.0.5 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='popularitystate',
+            name='recent_links',
+            field=models.TextField(default='{}', editable=False),
+        ),
+    ]
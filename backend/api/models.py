@@ -3,6 +3,7 @@ from django.core.validators import MinValueValidator
 from django.db import models
 
 from .serve_functions import rename_with_date
+from .storage import RecipeImageStorage
 
 User = get_user_model()
 
@@ -48,6 +49,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to=rename_with_date,
+        storage=RecipeImageStorage(),
         blank=True,
         null=True
     )
@@ -65,9 +67,28 @@ class Recipe(models.Model):
         validators=[MinValueValidator(1)]
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        db_index=True
+    )
+    shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -122,6 +143,7 @@ class FavoritRecipe(models.Model):
         on_delete=models.CASCADE,
         related_name='is_favorite_for_users'
     )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         ordering = ['user__last_name']
@@ -147,6 +169,7 @@ class ShoppingList(models.Model):
         on_delete=models.CASCADE,
         related_name='is_in_shopping_list'
     )
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         ordering = ['user__last_name']
@@ -159,3 +182,93 @@ class ShoppingList(models.Model):
 
     def __str__(self):
         return f'{self.recipe} is in shopping list of {self.user}'
+
+
+class RecipePopularity(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity'
+    )
+    score = models.FloatField(default=0, db_index=True)
+
+    class Meta:
+        ordering = ['-score']
+
+    def __str__(self):
+        return f'{self.recipe} has popularity {self.score}'
+
+
+class PopularityState(models.Model):
+    epoch = models.DateTimeField()
+    processed_until = models.DateTimeField(null=True)
+    # JSON ids of the links created within POPULARITY_COMMIT_LAG before
+    # processed_until, which the next run scans again and skips.
+    recent_links = models.TextField(default='{}', editable=False)
+
+    def __str__(self):
+        return f'Popularity processed until {self.processed_until}'
+
+
+def rendition_path(instance, filename):
+    return f'recipes/renditions/{instance.recipe_id}/{filename}'
+
+
+class ImageRendition(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='renditions'
+    )
+    size = models.CharField(max_length=20)
+    format = models.CharField(max_length=10)
+    image = models.ImageField(upload_to=rendition_path)
+
+    class Meta:
+        ordering = ['recipe', 'size', 'format']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'size', 'format'],
+                name='unique_rendition'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} {self.size} {self.format}'
+
+
+class ImageJob(models.Model):
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'pending'),
+        (PROCESSING, 'processing'),
+        (DONE, 'done'),
+        (FAILED, 'failed'),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs'
+    )
+    image = models.CharField(max_length=100)
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created']
+
+    def __str__(self):
+        return f'{self.recipe} image job is {self.status}'
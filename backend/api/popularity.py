@@ -0,0 +1,88 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import (FavoritRecipe, PopularityState, RecipePopularity,
+                     ShoppingList)
+
+POPULARITY_WEIGHTS = (
+    (FavoritRecipe, 1.0),
+    (ShoppingList, 0.5),
+)
+REBASE_AFTER_HALF_LIVES = 256
+
+
+def decay_factor(moment, epoch):
+    half_life = settings.POPULARITY_HALF_LIFE.total_seconds()
+    return 2 ** ((moment - epoch).total_seconds() / half_life)
+
+
+@transaction.atomic
+def refresh_popularity():
+    """Adds links created since the previous run to the recipe scores.
+
+    Every event is stored with weight 2 ** ((created - epoch) / half-life),
+    so older scores never need to be decayed: ordering by the stored score
+    is the same as ordering by the score decayed to any moment. The epoch
+    is only moved forward when the weights get too big for a float.
+    """
+    now = timezone.now()
+    state = PopularityState.objects.select_for_update().first()
+    if state is None:
+        state = PopularityState.objects.create(epoch=now)
+
+    half_lives = ((now - state.epoch).total_seconds()
+                  / settings.POPULARITY_HALF_LIFE.total_seconds())
+    if half_lives > REBASE_AFTER_HALF_LIVES:
+        RecipePopularity.objects.update(
+            score=F('score') / decay_factor(now, state.epoch)
+        )
+        state.epoch = now
+
+    # A link is stamped when it is inserted but may commit later, so the
+    # last POPULARITY_COMMIT_LAG of the previous run is scanned again and
+    # the links counted then are skipped by id.
+    lag_start = now - settings.POPULARITY_COMMIT_LAG
+    counted = json.loads(state.recent_links)
+    recent = {}
+    deltas = defaultdict(float)
+    events = 0
+    for model, weight in POPULARITY_WEIGHTS:
+        label = model._meta.label_lower
+        skipped = set(counted.get(label, ()))
+        recent[label] = []
+        links = model.objects.filter(created__lte=now)
+        if state.processed_until is not None:
+            links = links.filter(
+                created__gt=state.processed_until
+                - settings.POPULARITY_COMMIT_LAG
+            )
+        links = links.order_by().values_list('id', 'recipe_id', 'created')
+        for link_id, recipe_id, created in links.iterator():
+            if created > lag_start:
+                recent[label].append(link_id)
+            if link_id in skipped:
+                continue
+            deltas[recipe_id] += weight * decay_factor(created, state.epoch)
+            events += 1
+
+    existing = RecipePopularity.objects.in_bulk(list(deltas))
+    for recipe_id, popularity in existing.items():
+        popularity.score += deltas[recipe_id]
+    RecipePopularity.objects.bulk_update(
+        existing.values(), ['score'], batch_size=1000
+    )
+    RecipePopularity.objects.bulk_create(
+        (RecipePopularity(recipe_id=recipe_id, score=delta)
+         for recipe_id, delta in deltas.items()
+         if recipe_id not in existing)
+    )
+
+    state.processed_until = now
+    state.recent_links = json.dumps(recent)
+    state.save()
+    return events, len(deltas)
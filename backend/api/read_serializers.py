@@ -0,0 +1,159 @@
+from collections.abc import Mapping
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from backend.middleware import time_serializer
+from users.models import Subscription
+
+from .memberships import get_memberships
+from .models import FavoritRecipe, ShoppingList
+
+
+class ReadSerializer:
+    """Read-only stand-in for a ModelSerializer built of plain dicts.
+
+    Produces the same JSON as the matching DRF serializer for objects
+    loaded by the views (with their prefetches), without per-field
+    introspection. The request is looked up once per `data` call.
+    """
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        request = self.context.get('request')
+        if self.many:
+            return [self.to_representation(obj, request)
+                    for obj in self.instance]
+        return self.to_representation(self.instance, request)
+
+    def to_representation(self, obj, request):
+        raise NotImplementedError
+
+
+def file_url(file, request):
+    if not file:
+        return None
+    if request is None:
+        return file.url
+    return request.build_absolute_uri(file.url)
+
+
+def represent_tag(tag):
+    return {
+        'id': tag.id,
+        'name': tag.name,
+        'color': tag.color,
+        'slug': tag.slug,
+    }
+
+
+def represent_user(user, request):
+    if hasattr(user, 'is_subscribed'):
+        is_subscribed = user.is_subscribed
+    else:
+        is_subscribed = user.id in get_memberships(request, Subscription)
+    return {
+        'email': user.email,
+        'id': user.id,
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'is_subscribed': is_subscribed,
+    }
+
+
+class TagReadSerializer(ReadSerializer):
+    def to_representation(self, tag, request):
+        return represent_tag(tag)
+
+
+class IngredientReadSerializer(ReadSerializer):
+    def to_representation(self, ingredient, request):
+        # The ingredient index hands out rows from .values().
+        if isinstance(ingredient, Mapping):
+            return {
+                'id': ingredient['id'],
+                'name': ingredient['name'],
+                'measurement_unit': ingredient['measurement_unit'],
+            }
+        return {
+            'id': ingredient.id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+        }
+
+
+class UserReadSerializer(ReadSerializer):
+    def to_representation(self, user, request):
+        return represent_user(user, request)
+
+
+class RecipeReadSerializer(ReadSerializer):
+    def to_representation(self, recipe, request):
+        renditions = {}
+        for rendition in recipe.renditions.all():
+            renditions.setdefault(rendition.size, {})[rendition.format] = (
+                file_url(rendition.image, request)
+            )
+        return {
+            'id': recipe.id,
+            'tags': [represent_tag(tag) for tag in recipe.tags.all()],
+            'author': represent_user(recipe.author, request),
+            'ingredients': [
+                {
+                    # IngredientForRecipeSerializer declares the id as a
+                    # CharField.
+                    'id': str(note.ingredient.id),
+                    'name': note.ingredient.name,
+                    'measurement_unit': note.ingredient.measurement_unit,
+                    'amount': note.amount,
+                }
+                for note in recipe.ingredientforrecipe_set.all()
+            ],
+            'is_favorited': self.is_in_list(
+                FavoritRecipe, recipe, 'is_favorited', request
+            ),
+            'is_in_shopping_cart': self.is_in_list(
+                ShoppingList, recipe, 'is_in_shopping_cart', request
+            ),
+            'name': recipe.name,
+            'image': file_url(recipe.image, request),
+            'renditions': renditions,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+    def is_in_list(self, model, recipe, annotation, request):
+        if hasattr(recipe, annotation):
+            return getattr(recipe, annotation)
+        return recipe.pk in get_memberships(request, model)
+
+
+class ReadSerializerMixin:
+    """Serves read_serializer_actions with read_serializer_class.
+
+    Writes and other actions keep the view's DRF serializer, and
+    FAST_READ_SERIALIZERS switches the fast path off everywhere.
+    """
+    read_serializer_class = None
+    read_serializer_actions = ('list', 'retrieve')
+
+    def get_serializer_class(self):
+        if (settings.FAST_READ_SERIALIZERS
+                and self.read_serializer_class is not None
+                and self.request.method in SAFE_METHODS
+                and self.action in self.read_serializer_actions):
+            return self.read_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        # REQUEST_METRICS reports the time of serializer.data separately.
+        return time_serializer(
+            super().get_serializer(*args, **kwargs),
+            self.request
+        )
@@ -0,0 +1,86 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import Subscription
+
+from .caching import get_reference_version
+from .memberships import get_memberships
+from .models import FavoritRecipe, Ingredient, ShoppingList, Tag
+
+
+def recipe_version_key(recipe_id):
+    return f'recipe:{recipe_id}:version'
+
+
+def author_version_key(author_id):
+    return f'recipe-author:{author_id}:version'
+
+
+def get_versions(keys):
+    versions = cache.get_many(keys)
+    for key in set(keys) - versions.keys():
+        cache.add(key, time.time(), settings.RECIPE_CACHE_TIMEOUT)
+        versions[key] = cache.get(key, 0)
+    return versions
+
+
+def get_cached_recipes(recipes, base_url, serialize):
+    """Returns serialized recipes by id, cached per recipe version.
+
+    Only the ids missing from the cache are passed to `serialize`. The
+    versions are read before the recipes are serialized, so a body built
+    from data changed in the meantime is stored under an outdated key.
+    """
+    versions = get_versions(
+        [recipe_version_key(recipe.pk) for recipe in recipes]
+        + [author_version_key(recipe.author_id) for recipe in recipes]
+    )
+    references = (f'{get_reference_version(Tag)}:'
+                  f'{get_reference_version(Ingredient)}')
+    keys = {
+        recipe.pk: (f'recipe-body:{recipe.pk}:'
+                    f'{versions[recipe_version_key(recipe.pk)]}:'
+                    f'{versions[author_version_key(recipe.author_id)]}:'
+                    f'{references}:{base_url}')
+        for recipe in recipes
+    }
+    cached = cache.get_many(list(keys.values()))
+    bodies = {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items() if key in cached
+    }
+    missing = [recipe_id for recipe_id in keys if recipe_id not in bodies]
+    if missing:
+        serialized = {body['id']: body for body in serialize(missing)}
+        cache.set_many(
+            {keys[recipe_id]: body for recipe_id, body in serialized.items()},
+            settings.RECIPE_CACHE_TIMEOUT
+        )
+        bodies.update(serialized)
+    return bodies
+
+
+def invalidate_recipe_cache(recipe_id):
+    transaction.on_commit(lambda: cache.delete(recipe_version_key(recipe_id)))
+
+
+def invalidate_author_recipes_cache(author_id):
+    transaction.on_commit(lambda: cache.delete(author_version_key(author_id)))
+
+
+def overlay_user_flags(body, request):
+    """Copies a cached body with the flags of the requesting user."""
+    return {
+        **body,
+        'author': {
+            **body['author'],
+            'is_subscribed': (body['author']['id']
+                              in get_memberships(request, Subscription))
+        },
+        'is_favorited': body['id'] in get_memberships(request, FavoritRecipe),
+        'is_in_shopping_cart': (body['id']
+                                in get_memberships(request, ShoppingList)),
+    }
@@ -0,0 +1,208 @@
+import json
+from collections import Counter, defaultdict
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+
+from .feed import invalidate_followers_feeds
+from .images import enqueue_image_processing
+from .models import Ingredient, IngredientForRecipe, Recipe, Tag, TagForRecipe
+from .serializers import RecipeImportSerializer
+
+User = get_user_model()
+
+TRANSFER_CHUNK_SIZE = 500
+
+
+def parse_lines(lines):
+    for number, line in enumerate(lines, 1):
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if not line.strip():
+                continue
+            yield number, json.loads(line), None
+        except ValueError:
+            yield number, None, {'errors': 'Invalid JSON'}
+
+
+def load_references(items):
+    tags = {
+        tag.slug: tag for tag in Tag.objects.filter(
+            slug__in={slug for __, item in items for slug in item['tags']}
+        )
+    }
+    ingredients = Ingredient.objects.in_bulk(
+        {note['name'] for __, item in items for note in item['ingredients']},
+        field_name='name'
+    )
+    authors = User.objects.in_bulk(
+        {item['author'] for __, item in items if 'author' in item},
+        field_name='email'
+    )
+    return tags, ingredients, authors
+
+
+def resolve_references(item, references, default_author):
+    tags, ingredients, authors = references
+    errors = {}
+    if not all(slug in tags for slug in item['tags']):
+        errors['tags'] = {'errors': 'Some values do not exist'}
+    if not all(note['name'] in ingredients for note in item['ingredients']):
+        errors['ingredients'] = {'errors': 'Some values do not exist'}
+    if 'author' in item:
+        item['author'] = authors.get(item['author'])
+    else:
+        item['author'] = default_author
+    if item['author'] is None:
+        errors['author'] = {'errors': 'Some values do not exist'}
+    if not errors:
+        item['tags'] = [tags[slug] for slug in item['tags']]
+        for note in item['ingredients']:
+            note['ingredient'] = ingredients[note['name']]
+    return errors
+
+
+def validate_chunk(chunk, default_author):
+    items, results = [], {}
+    for number, data, errors in chunk:
+        serializer = RecipeImportSerializer(data=data)
+        if errors is None and not serializer.is_valid():
+            errors = serializer.errors
+        if errors is not None:
+            results[number] = {'line': number, 'errors': errors}
+        else:
+            items.append((number, serializer.validated_data))
+    references = load_references(items)
+    valid = []
+    for number, item in items:
+        errors = resolve_references(item, references, default_author)
+        if errors:
+            results[number] = {'line': number, 'errors': errors}
+        else:
+            valid.append((number, item))
+    return valid, results
+
+
+def save_chunk(items):
+    recipes = [
+        Recipe(
+            author=item['author'],
+            name=item['name'],
+            text=item['text'],
+            cooking_time=item['cooking_time'],
+            image=item.get('image')
+        )
+        for __, item in items
+    ]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+    else:
+        for recipe in recipes:
+            recipe.save()
+    # pub_date is auto_now_add, so inserts always set the current time.
+    dated = []
+    for recipe, (__, item) in zip(recipes, items):
+        if item.get('pub_date') is not None:
+            recipe.pub_date = item['pub_date']
+            dated.append(recipe)
+    Recipe.objects.bulk_update(dated, ['pub_date'])
+    TagForRecipe.objects.bulk_create(
+        TagForRecipe(recipe=recipe, tag=tag)
+        for recipe, (__, item) in zip(recipes, items)
+        for tag in item['tags']
+    )
+    IngredientForRecipe.objects.bulk_create(
+        IngredientForRecipe(
+            recipe=recipe,
+            ingredient=note['ingredient'],
+            amount=note['amount']
+        )
+        for recipe, (__, item) in zip(recipes, items)
+        for note in item['ingredients']
+    )
+    authors = Counter(recipe.author_id for recipe in recipes)
+    for author_id, created in authors.items():
+        User.objects.filter(pk=author_id).update(
+            recipes_count=F('recipes_count') + created
+        )
+        invalidate_followers_feeds(author_id)
+    for recipe in recipes:
+        if recipe.image:
+            enqueue_image_processing(recipe)
+    return recipes
+
+
+def import_recipe_lines(lines, default_author=None,
+                        chunk_size=TRANSFER_CHUNK_SIZE):
+    """Imports NDJSON recipes chunk by chunk, yielding a result per line.
+
+    Each chunk is saved in its own transaction, so a database error only
+    fails the recipes of that chunk.
+    """
+    parsed = parse_lines(lines)
+    while True:
+        chunk = list(islice(parsed, chunk_size))
+        if not chunk:
+            return
+        items, results = validate_chunk(chunk, default_author)
+        try:
+            with transaction.atomic():
+                recipes = save_chunk(items)
+        except DatabaseError:
+            for number, __ in items:
+                results[number] = {
+                    'line': number,
+                    'errors': {'errors': 'Could not save recipe'}
+                }
+        else:
+            for (number, __), recipe in zip(items, recipes):
+                results[number] = {'line': number, 'id': recipe.pk}
+        for number, __, __ in chunk:
+            yield results[number]
+
+
+def export_recipe_lines(queryset, image_url=None,
+                        chunk_size=TRANSFER_CHUNK_SIZE):
+    recipes = queryset.select_related('author').order_by('id').iterator(
+        chunk_size=chunk_size
+    )
+    while True:
+        chunk = list(islice(recipes, chunk_size))
+        if not chunk:
+            return
+        ids = [recipe.pk for recipe in chunk]
+        tags = defaultdict(list)
+        for recipe_id, slug in TagForRecipe.objects.filter(
+            recipe_id__in=ids
+        ).order_by('tag__slug').values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, measurement_unit, amount in (
+            IngredientForRecipe.objects.filter(recipe_id__in=ids)
+            .order_by('ingredient__name')
+            .values_list('recipe_id', 'ingredient__name',
+                         'ingredient__measurement_unit', 'amount')
+        ):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        for recipe in chunk:
+            image = recipe.image.url if recipe.image else None
+            if image is not None and image_url is not None:
+                image = image_url(image)
+            yield json.dumps({
+                'id': recipe.pk,
+                'author': recipe.author.email,
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'pub_date': recipe.pub_date.isoformat(),
+                'tags': tags[recipe.pk],
+                'ingredients': ingredients[recipe.pk],
+                'image_url': image,
+            }, ensure_ascii=False) + '\n'
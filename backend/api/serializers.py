@@ -1,13 +1,17 @@
 import base64
-import re
+import binascii
+import tempfile
 
-from django.core.files import base, images
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.core.files import images
+from django.db import transaction
 from rest_framework import serializers
-from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.exceptions import ValidationError
 
 from users.serializers import CustomUserSerializer
 
+from .fields import RenditionsField
+from .memberships import get_memberships
 from .models import (FavoritRecipe, Ingredient, IngredientForRecipe, Recipe,
                      ShoppingList, Tag, TagForRecipe)
 
@@ -44,25 +48,83 @@ class IngredientForRecipeSerializer(serializers.ModelSerializer):
         return data
 
 
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'RIFF', 'webp'),
+)
+BASE64_CHUNK_SIZE = 64 * 1024
+MAX_INGREDIENT_AMOUNT = 2147483647
+
+
 class FromBase64ToImg(serializers.ImageField):
     def to_internal_value(self, data):
+        start = self.get_payload_start(data)
+        image_file = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
         try:
-            __, filename, __, image_encoded = re.split(';|,|:', data)
-            filename = '.'.join(filename.split('/'))
-            image_decoded = base64.b64decode(image_encoded)
-            content = base.ContentFile(image_decoded)
-            data = images.ImageFile(content, filename)
-        except APIException:
-            raise serializers.ValidationError(
-                {'errors': 'Can not decode image'}
-            )
-        return data
+            extension = self.decode(data, start, image_file)
+        except ValidationError:
+            image_file.close()
+            raise
+        image_file.seek(0)
+        return images.ImageFile(image_file, f'image.{extension}')
+
+    def get_payload_start(self, data):
+        if not isinstance(data, str) or not data.startswith('data:'):
+            raise ValidationError({'errors': 'Can not decode image'})
+        separator = data.find(',', 0, 100)
+        if separator == -1 or not data[:separator].endswith(';base64'):
+            raise ValidationError({'errors': 'Can not decode image'})
+        start = separator + 1
+        if (len(data) - start) // 4 * 3 > settings.RECIPE_IMAGE_MAX_SIZE + 2:
+            self.fail_too_large()
+        return start
+
+    def decode(self, data, start, image_file):
+        extension = None
+        try:
+            for position in range(start, len(data), BASE64_CHUNK_SIZE):
+                chunk = base64.b64decode(
+                    data[position:position + BASE64_CHUNK_SIZE],
+                    validate=True
+                )
+                if position == start:
+                    extension = self.get_extension(chunk)
+                    if extension is None:
+                        break
+                image_file.write(chunk)
+        except (binascii.Error, ValueError):
+            raise ValidationError({'errors': 'Can not decode image'})
+        if extension is None:
+            raise ValidationError({'errors': 'Unsupported image format'})
+        if image_file.tell() > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail_too_large()
+        return extension
+
+    def get_extension(self, header):
+        for signature, extension in IMAGE_SIGNATURES:
+            if header.startswith(signature):
+                if extension == 'webp' and header[8:12] != b'WEBP':
+                    return None
+                return extension
+        return None
+
+    def fail_too_large(self):
+        raise ValidationError({
+            'errors': 'Image must not be larger than '
+                      f'{settings.RECIPE_IMAGE_MAX_SIZE} bytes'
+        })
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
     image = FromBase64ToImg()
+    renditions = RenditionsField()
     ingredients = IngredientForRecipeSerializer(
         source='ingredientforrecipe_set',
         many=True
@@ -73,8 +135,8 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ("id", "tags", "author", "ingredients", "is_favorited",
-                  "is_in_shopping_cart", "name", "image", "text",
-                  "cooking_time")
+                  "is_in_shopping_cart", "name", "image", "renditions",
+                  "text", "cooking_time")
 
     def if_ids_repeated(self, value):
         ids_request_set = set(value)
@@ -84,61 +146,140 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
 
     def if_ids_dont_exist(self, value, model):
-        ids_request_set = set(value)
-        queryset = model.objects.all().only('id')
-        ids_from_base_set = {note.id for note in queryset}
-        if not ids_request_set.issubset(ids_from_base_set):
+        objects = model.objects.in_bulk(value)
+        if not len(objects) == len(value):
+            raise ValidationError(
+                {'errors': 'Some values do not exist'}
+            )
+        return objects
+
+    def ids_to_int(self, value):
+        try:
+            return [int(note_id) for note_id in value]
+        except (TypeError, ValueError):
             raise ValidationError(
                 {'errors': 'Some values do not exist'}
             )
 
     def validate_tags(self, value):
-        self.if_ids_repeated(value)
-        self.if_ids_dont_exist(value, Tag)
+        ids_list = self.ids_to_int(value)
+        self.if_ids_repeated(ids_list)
+        self.tags_objects = self.if_ids_dont_exist(ids_list, Tag)
         return value
 
+    def amount_to_int(self, value):
+        try:
+            amount = int(value)
+        except (TypeError, ValueError):
+            amount = 0
+        if not 0 < amount <= MAX_INGREDIENT_AMOUNT:
+            raise ValidationError(
+                {'errors': 'Amount must be a positive integer'}
+            )
+        return amount
+
     def validate_ingredients(self, value):
-        ids_list = [int(note['id']) for note in value]
+        if not all(isinstance(note, dict) for note in value):
+            raise ValidationError(
+                {'errors': 'Ingredients must be objects with id and amount'}
+            )
+        ids_list = self.ids_to_int(note.get('id') for note in value)
         self.if_ids_repeated(ids_list)
-        self.if_ids_dont_exist(ids_list, Ingredient)
-        return value
+        self.ingredients_objects = self.if_ids_dont_exist(
+            ids_list,
+            Ingredient
+        )
+        return [
+            {
+                'id': ingredient_id,
+                'amount': self.amount_to_int(note.get('amount'))
+            }
+            for ingredient_id, note in zip(ids_list, value)
+        ]
 
     def create_tags(self, tags, recipe):
-        for tag_id in tags:
-            tag = get_object_or_404(Tag, id=tag_id)
-            TagForRecipe.objects.create(tag=tag, recipe=recipe)
+        return TagForRecipe.objects.bulk_create(
+            TagForRecipe(tag=self.tags_objects[int(tag_id)], recipe=recipe)
+            for tag_id in tags
+        )
 
     def update_tags(self, tags, recipe):
-        TagForRecipe.objects.filter(recipe=recipe).delete()
-        self.create_tags(tags, recipe)
+        new_ids = {int(tag_id) for tag_id in tags}
+        current_ids = set(
+            TagForRecipe.objects.filter(recipe=recipe)
+            .values_list('tag_id', flat=True)
+        )
+        if current_ids - new_ids:
+            TagForRecipe.objects.filter(
+                recipe=recipe,
+                tag_id__in=current_ids - new_ids
+            ).delete()
+        self.create_tags(new_ids - current_ids, recipe)
 
     def create_ingredients(self, ingredients, recipe):
-        for ingredient in ingredients:
-            ingredient_id, amount = ingredient['id'], ingredient['amount']
-            ingredient_obj = get_object_or_404(
-                Ingredient, id=ingredient_id
-            )
-            IngredientForRecipe.objects.create(
-                ingredient=ingredient_obj,
-                amount=amount,
+        return IngredientForRecipe.objects.bulk_create(
+            IngredientForRecipe(
+                ingredient=self.ingredients_objects[int(ingredient['id'])],
+                amount=ingredient['amount'],
                 recipe=recipe
             )
+            for ingredient in ingredients
+        )
 
     def update_ingredients(self, ingredients, recipe):
-        IngredientForRecipe.objects.filter(recipe=recipe).delete()
-        self.create_ingredients(ingredients, recipe)
-
+        new_amounts = {
+            int(ingredient['id']): int(ingredient['amount'])
+            for ingredient in ingredients
+        }
+        current = {
+            note.ingredient_id: note
+            for note in IngredientForRecipe.objects.filter(recipe=recipe)
+        }
+        removed_ids = current.keys() - new_amounts.keys()
+        if removed_ids:
+            IngredientForRecipe.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed_ids
+            ).delete()
+        changed = []
+        for ingredient_id, note in current.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and note.amount != amount:
+                note.amount = amount
+                changed.append(note)
+        if changed:
+            IngredientForRecipe.objects.bulk_update(changed, ['amount'])
+        self.create_ingredients(
+            [{'id': ingredient_id, 'amount': new_amounts[ingredient_id]}
+             for ingredient_id in new_amounts.keys() - current.keys()],
+            recipe
+        )
+
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredientforrecipe_set')
 
         recipe = Recipe.objects.create(**validated_data)
 
-        self.create_tags(tags, recipe)
-        self.create_ingredients(ingredients, recipe)
-
+        tags_for_recipe = self.create_tags(tags, recipe)
+        ingredients_for_recipe = self.create_ingredients(ingredients, recipe)
+
+        # A new recipe is in nobody's lists yet, and its tags and
+        # ingredients are already in memory, so the response is built
+        # without reading them back.
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
+        recipe._prefetched_objects_cache = {
+            'tags': sorted(
+                (note.tag for note in tags_for_recipe),
+                key=lambda tag: tag.name
+            ),
+            'ingredientforrecipe_set': ingredients_for_recipe,
+            'renditions': [],
+        }
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', False)
         ingredients = validated_data.pop('ingredientforrecipe_set', False)
@@ -155,18 +296,46 @@ class RecipeSerializer(serializers.ModelSerializer):
 
         return instance
 
-    def _is_in_list(self, model, obj):
-        if not self.context['request'].user.is_authenticated:
-            return False
-        if model.objects.filter(
-            recipe=obj,
-            user=self.context['request'].user
-        ).exists():
-            return True
-        return False
+    def _is_in_list(self, model, obj, annotation):
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        return obj.pk in get_memberships(self.context['request'], model)
 
     def get_is_favorited(self, obj):
-        return self._is_in_list(FavoritRecipe, obj)
+        return self._is_in_list(FavoritRecipe, obj, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self._is_in_list(ShoppingList, obj)
+        return self._is_in_list(ShoppingList, obj, 'is_in_shopping_cart')
+
+
+class IngredientImportSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=100)
+    amount = serializers.IntegerField(
+        min_value=1,
+        max_value=MAX_INGREDIENT_AMOUNT
+    )
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    author = serializers.EmailField(required=False)
+    name = serializers.CharField(max_length=50)
+    text = serializers.CharField(max_length=300)
+    cooking_time = serializers.IntegerField(min_value=1)
+    pub_date = serializers.DateTimeField(required=False)
+    image = FromBase64ToImg(required=False, allow_null=True)
+    tags = serializers.ListField(
+        child=serializers.SlugField(),
+        allow_empty=False
+    )
+    ingredients = IngredientImportSerializer(many=True, allow_empty=False)
+
+    def validate_tags(self, value):
+        if len(set(value)) != len(value):
+            raise ValidationError({'errors': 'Check for repeated values'})
+        return value
+
+    def validate_ingredients(self, value):
+        names = [note['name'] for note in value]
+        if len(set(names)) != len(names):
+            raise ValidationError({'errors': 'Check for repeated values'})
+        return value
@@ -1,7 +1,6 @@
 import datetime as dt
-from collections import defaultdict
 
-from django.http import HttpResponse
+from django.http import StreamingHttpResponse
 from pytz import timezone
 
 from backend import settings
@@ -15,19 +14,13 @@ def rename_with_date(instance, filename):
     return f'recipes/{filename}'
 
 
-def form_shop_list(queryset):
-    to_buy_list = defaultdict(int)
-    for note in queryset:
-        to_buy_list[(note.ingredient.name,
-                    note.ingredient.measurement_unit)] += note.amount
-    final_string = ''
-    for ingredient, amount in to_buy_list.items():
-        final_string += f'{ingredient[0]} - {amount}({ingredient[1]})\n'
-    return final_string
+def form_shop_list(queryset, exporter):
+    return exporter.render(queryset.iterator())
 
 
-def add_file_to_response(data, content_type):
-    response = HttpResponse(data, content_type=content_type)
+def add_file_to_response(data, exporter):
+    response = StreamingHttpResponse(data, content_type=exporter.content_type)
     response['Content-Disposition'] = ('attachment;'
-                                       ' filename="shop_list.txt"')
+                                       ' filename="shop_list.'
+                                       f'{exporter.extension}"')
     return response
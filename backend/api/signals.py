@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_reference_cache
+from .memberships import (MEMBER_FIELDS, invalidate_memberships,
+                          update_memberships)
+from .models import Ingredient, Recipe, Tag
+from .recipe_cache import (invalidate_author_recipes_cache,
+                           invalidate_recipe_cache)
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def reference_changed(sender, **kwargs):
+    invalidate_reference_cache(sender)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipe_cache(instance.pk)
+
+
+@receiver(post_save, sender=get_user_model())
+def author_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login only, which is not part of a recipe.
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        invalidate_author_recipes_cache(instance.pk)
+
+
+def link_saved(sender, instance, created, **kwargs):
+    if created:
+        update_memberships(instance, added=True)
+    else:
+        # The previous member is unknown, so the whole set is reloaded.
+        invalidate_memberships(instance.user_id, sender)
+
+
+def link_deleted(sender, instance, **kwargs):
+    update_memberships(instance, added=False)
+
+
+for model in MEMBER_FIELDS:
+    post_save.connect(link_saved, sender=model)
+    post_delete.connect(link_deleted, sender=model)
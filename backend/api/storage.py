@@ -0,0 +1,56 @@
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class RecipeImageStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if not settings.CONTENT_ADDRESSED_IMAGES:
+            return super().save(name, content, max_length)
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        # The same name means the same bytes, so an existing blob is reused.
+        # Its modification time is refreshed so that cleanup_media does not
+        # take it for an old orphan before the new reference is committed.
+        if self.exists(name):
+            try:
+                os.utime(self.path(name))
+            except FileNotFoundError:
+                pass
+            else:
+                return name
+        return super().save(name, content, max_length)
+
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory,
+            digest[:2],
+            digest[2:4],
+            f'{digest}{extension}'
+        )
+
+
+def iter_storage_files(storage, path):
+    directories, files = storage.listdir(path)
+    for filename in files:
+        yield posixpath.join(path, filename)
+    for directory in directories:
+        yield from iter_storage_files(
+            storage,
+            posixpath.join(path, directory)
+        )
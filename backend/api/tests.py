@@ -0,0 +1,698 @@
+import importlib.util
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from itertools import product
+from unittest import skipIf, skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import ExifTags, Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from backend.renderers import FastJSONRenderer
+from users.models import CustomUser, Subscription
+from users.serializers import CustomUserSerializer, SubscriptionsUserSerializer
+
+from .exporters import SHOP_LIST_EXPORTERS
+from .filters import IngredientFilter
+from .images import (enqueue_image_processing, is_lossless_webp,
+                     process_image_job)
+from .ingredient_import import import_ingredients
+from .models import (FavoritRecipe, ImageRendition, Ingredient,
+                     IngredientForRecipe, PopularityState, Recipe,
+                     RecipePopularity, ShoppingList, Tag, TagForRecipe)
+from .popularity import refresh_popularity
+from .read_serializers import (IngredientReadSerializer, RecipeReadSerializer,
+                               TagReadSerializer, UserReadSerializer)
+from .recipe_transfer import export_recipe_lines, import_recipe_lines
+from .serializers import IngredientSerializer, RecipeSerializer, TagSerializer
+from .views import RecipeViewSet
+
+
+class RecipeDataMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create_user(
+                email=f'user{index}@example.org',
+                username=f'user{index}',
+                first_name='Name',
+                last_name=f'Surname {index}',
+                password='password'
+            )
+            for index in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(name=f'tag {index}', color='#ffffff',
+                               slug=f'tag-{index}')
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ingredient {index}',
+                                      measurement_unit='g')
+            for index in range(10)
+        ]
+        cls.recipes = []
+        for index in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.users[index % 3],
+                name=f'recipe {index}',
+                text='text',
+                cooking_time=10,
+                image='recipes/image.png'
+            )
+            TagForRecipe.objects.create(recipe=recipe,
+                                        tag=cls.tags[index % 3])
+            for offset in range(3):
+                IngredientForRecipe.objects.create(
+                    recipe=recipe,
+                    ingredient=cls.ingredients[(index + offset) % 10],
+                    amount=offset + 1
+                )
+            cls.recipes.append(recipe)
+        reader = cls.users[0]
+        for recipe in cls.recipes[::2]:
+            FavoritRecipe.objects.create(user=reader, recipe=recipe)
+        for recipe in cls.recipes[::3]:
+            ShoppingList.objects.create(user=reader, recipe=recipe)
+        Subscription.objects.create(user=reader,
+                                    interesting_author=cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+
+class RecipeQueryCountTests(RecipeDataMixin, TestCase):
+    # The counts must not depend on the page size: every extra query per
+    # recipe is an N+1 regression of the list flags or prefetches.
+    def assert_list_queries(self, client, number, **settings):
+        for limit in (1, 12):
+            cache.clear()
+            with override_settings(**settings):
+                with self.assertNumQueries(number):
+                    response = client.get(f'/api/recipes/?limit={limit}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()['results']), limit)
+
+    def test_list(self):
+        # Count, page, favorites, cart, follows, then recipes with tags,
+        # ingredients and renditions for the cache misses.
+        self.assert_list_queries(self.client, 9)
+
+    def test_list_warm_cache(self):
+        # Only the count and the page, recipes and flag sets are cached.
+        self.client.get('/api/recipes/?limit=12')
+        with self.assertNumQueries(2):
+            self.client.get('/api/recipes/?limit=12')
+
+    def test_list_uncached(self):
+        self.assert_list_queries(self.client, 8, RECIPE_CACHE_TIMEOUT=0)
+
+    def test_list_drf_serializers(self):
+        self.assert_list_queries(
+            self.client,
+            8,
+            RECIPE_CACHE_TIMEOUT=0,
+            FAST_READ_SERIALIZERS=False
+        )
+
+    def test_list_anonymous(self):
+        self.assert_list_queries(self.anonymous, 6)
+
+    def test_list_favorited(self):
+        with self.assertNumQueries(9):
+            response = self.client.get('/api/recipes/?is_favorited=true')
+        self.assertEqual(response.json()['count'], 6)
+
+    def test_retrieve(self):
+        # Recipe with its author, tags, ingredients, renditions, then
+        # favorites, cart and follows.
+        with self.assertNumQueries(7):
+            response = self.client.get(f'/api/recipes/{self.recipes[0].pk}/')
+        data = response.json()
+        self.assertTrue(data['is_favorited'])
+        self.assertTrue(data['is_in_shopping_cart'])
+        self.assertFalse(data['author']['is_subscribed'])
+
+
+class RecipeIngredientValidationTests(RecipeDataMixin, TestCase):
+    def payload(self, ingredients):
+        return {
+            'name': 'new recipe',
+            'text': 'text',
+            'cooking_time': 5,
+            'tags': [self.tags[0].pk],
+            'ingredients': ingredients,
+        }
+
+    def test_invalid_ingredients(self):
+        ingredient_id = self.ingredients[0].pk
+        for ingredients in (
+            [ingredient_id],
+            ['text'],
+            [{'id': ingredient_id, 'amount': 'many'}],
+            [{'id': ingredient_id, 'amount': -1}],
+            [{'id': ingredient_id, 'amount': 0}],
+            [{'id': ingredient_id, 'amount': None}],
+            [{'id': ingredient_id}],
+            [{'id': ingredient_id, 'amount': 10 ** 12}],
+        ):
+            with self.subTest(ingredients=ingredients):
+                response = self.client.patch(
+                    f'/api/recipes/{self.recipes[0].pk}/',
+                    self.payload(ingredients),
+                    format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ingredients', response.json())
+
+    def test_amount_as_string(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipes[0].pk}/',
+            self.payload([{'id': self.ingredients[0].pk, 'amount': '7'}]),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['ingredients'][0]['amount'], 7)
+
+
+class RecipeSearchTests(RecipeDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Recipe.objects.filter(pk=cls.recipes[0].pk).update(name='Borscht')
+        Recipe.objects.filter(pk=cls.recipes[1].pk).update(
+            name='Green borscht'
+        )
+        Recipe.objects.filter(pk=cls.recipes[2].pk).update(
+            text='Serve with borscht'
+        )
+        base = Ingredient.objects.create(name='borscht base',
+                                         measurement_unit='g')
+        for recipe in (cls.recipes[1], cls.recipes[3]):
+            IngredientForRecipe.objects.create(recipe=recipe,
+                                               ingredient=base, amount=1)
+
+    def search(self, value):
+        response = self.client.get('/api/recipes/', {'search': value})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_rank(self):
+        # Name prefix, name, ingredient, then text matches, each once.
+        self.assertEqual(self.search('BORSCHT'), [
+            self.recipes[index].pk for index in (0, 1, 3, 2)
+        ])
+
+    def test_ingredient(self):
+        self.assertEqual(self.search('base'), [
+            self.recipes[3].pk, self.recipes[1].pk
+        ])
+
+    def test_no_match(self):
+        self.assertEqual(self.search('soup'), [])
+
+
+class SubscriptionsTests(RecipeDataMixin, TestCase):
+    def test_recipes_limit(self):
+        response = self.client.get('/api/users/subscriptions/',
+                                   {'recipes_limit': 2})
+        self.assertEqual(response.status_code, 200)
+        author, = response.json()['results']
+        self.assertEqual(len(author['recipes']), 2)
+
+    def test_invalid_recipes_limit(self):
+        for recipes_limit in ('0', '-1', 'all'):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_serializer_limit_from_context(self):
+        author = CustomUser.objects.get(pk=self.users[1].pk)
+        request = Request(APIRequestFactory().get(
+            '/api/users/subscriptions/', {'recipes_limit': 'all'}
+        ))
+        data = SubscriptionsUserSerializer(author, context={
+            'request': request,
+            'recipes_limit': 1,
+        }).data
+        self.assertEqual(len(data['recipes']), 1)
+
+
+class CounterTests(RecipeDataMixin, TestCase):
+    def test_delete_uncounted_recipe(self):
+        # Created through the ORM, so recipes_count was never increased.
+        recipe = Recipe.objects.create(author=self.users[0], name='orm',
+                                       text='text', cooking_time=1)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].recipes_count, 0)
+
+    def test_delete_uncounted_favorite(self):
+        recipe = self.recipes[0]
+        self.assertEqual(recipe.favorites_count, 0)
+        response = self.client.delete(f'/api/recipes/{recipe.pk}/favorite/')
+        self.assertEqual(response.status_code, 204)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+
+    def test_unsubscribe_uncounted(self):
+        response = self.client.delete(
+            f'/api/users/{self.users[1].pk}/subscribe/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.users[1].refresh_from_db()
+        self.assertEqual(self.users[1].followers_count, 0)
+
+
+class PopularityTests(RecipeDataMixin, TestCase):
+    def test_late_commit_is_counted_once(self):
+        refresh_popularity()
+        score = RecipePopularity.objects.get(recipe=self.recipes[0]).score
+        # Stamped before the previous run but committed after it.
+        link = FavoritRecipe.objects.create(user=self.users[2],
+                                            recipe=self.recipes[0])
+        processed_until = PopularityState.objects.get().processed_until
+        FavoritRecipe.objects.filter(pk=link.pk).update(
+            created=processed_until - timedelta(seconds=1)
+        )
+        self.assertEqual(refresh_popularity(), (1, 1))
+        self.assertEqual(refresh_popularity(), (0, 0))
+        self.assertGreater(
+            RecipePopularity.objects.get(recipe=self.recipes[0]).score,
+            score
+        )
+
+    def test_old_links_are_not_rescanned(self):
+        FavoritRecipe.objects.update(created=timezone.now() - timedelta(
+            days=1
+        ))
+        ShoppingList.objects.update(created=timezone.now() - timedelta(
+            days=1
+        ))
+        refresh_popularity()
+        self.assertEqual(PopularityState.objects.get().recent_links,
+                         '{"api.favoritrecipe": [], "api.shoppinglist": []}')
+
+
+class FeedTests(RecipeDataMixin, TestCase):
+    def walk_feed(self):
+        ids = []
+        url = '/api/recipes/feed/?limit=3'
+        while url:
+            cache.clear()
+            data = self.client.get(url).json()
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        return ids
+
+    def test_pages_match_uncached_feed(self):
+        expected = [recipe.pk for recipe in reversed(self.recipes[1::3])]
+        for size in (0, 2, 3, 500):
+            with self.subTest(size=size):
+                with override_settings(FEED_CACHE_SIZE=size):
+                    self.assertEqual(self.walk_feed(), expected)
+
+    def test_cached_page_skips_subquery(self):
+        self.client.get('/api/recipes/feed/?limit=3')
+        # Only the recipes of the page by id with tags, ingredients and
+        # renditions, the timeline and flag sets are cached.
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/recipes/feed/?limit=3')
+        with self.assertNumQueries(4):
+            self.client.get(response.json()['next'])
+
+
+class RequestMetricsTests(RecipeDataMixin, TestCase):
+    @override_settings(REQUEST_METRICS=True, RECIPE_CACHE_TIMEOUT=0)
+    def test_serialize_time(self):
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        with self.assertLogs('backend.requests', 'INFO') as logs:
+            response = client.get('/api/recipes/')
+        metrics = json.loads(logs.records[0].getMessage())
+        self.assertGreater(metrics['serialize_ms'], 0)
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        total = sum(metrics[key] for key in
+                    ('db_ms', 'serialize_ms', 'render_ms', 'app_ms'))
+        self.assertAlmostEqual(total, metrics['total_ms'], delta=0.05)
+
+
+class ImageMetadataTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name,
+                                     IMAGE_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = CustomUser.objects.create_user(
+            email='author@example.org',
+            username='author',
+            password='password'
+        )
+
+    def process(self, content, extension):
+        recipe = Recipe(author=self.author, name='recipe', text='text',
+                        cooking_time=10)
+        recipe.image.save(f'image.{extension}', ContentFile(content),
+                          save=False)
+        recipe.save()
+        uploaded = recipe.image.name
+        job = enqueue_image_processing(recipe)
+        self.assertTrue(process_image_job(job.pk))
+        recipe.refresh_from_db()
+        return uploaded, recipe.image
+
+    def test_exif_is_stripped(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = 6
+        exif[ExifTags.Base.Make] = 'Camera'
+        exif[ExifTags.IFD.GPSInfo] = {1: 'N', 2: (55.0, 45.0, 0.0)}
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 16)).save(buffer, 'JPEG', exif=exif.tobytes(),
+                                        comment=b'comment')
+        uploaded, image_file = self.process(buffer.getvalue(), 'jpg')
+        self.assertNotEqual(image_file.name, uploaded)
+        self.assertFalse(image_file.storage.exists(uploaded))
+        with Image.open(image_file) as image:
+            self.assertEqual(dict(image.getexif()), {
+                ExifTags.Base.Orientation: 6
+            })
+            self.assertNotIn('comment', image.info)
+            self.assertEqual(image.size, (32, 16))
+
+    def test_lossless_webp_stays_lossless(self):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Make] = 'Camera'
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 16), 'red').save(buffer, 'WEBP', lossless=True,
+                                               exif=exif.tobytes())
+        self.assertTrue(is_lossless_webp(io.BytesIO(buffer.getvalue())))
+        uploaded, image_file = self.process(buffer.getvalue(), 'webp')
+        self.assertNotEqual(image_file.name, uploaded)
+        with image_file.open('rb'):
+            self.assertTrue(is_lossless_webp(image_file))
+
+    def test_lossy_webp(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 16)).save(buffer, 'WEBP', quality=80)
+        self.assertFalse(is_lossless_webp(io.BytesIO(buffer.getvalue())))
+
+    def test_plain_image_is_kept(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (32, 16)).save(buffer, 'PNG', dpi=(72, 72))
+        uploaded, image_file = self.process(buffer.getvalue(), 'png')
+        self.assertEqual(image_file.name, uploaded)
+        with image_file.open('rb'):
+            self.assertEqual(image_file.read(), buffer.getvalue())
+
+
+class CleanupMediaTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings = override_settings(MEDIA_ROOT=media_root.name,
+                                     CONTENT_ADDRESSED_IMAGES=True)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = Recipe._meta.get_field('image').storage
+
+    def save_old(self, content):
+        name = self.storage.save('recipes/image.png', ContentFile(content))
+        old = (timezone.now() - timedelta(days=2)).timestamp()
+        os.utime(self.storage.path(name), (old, old))
+        return name
+
+    def cleanup(self):
+        call_command('cleanup_media', stdout=io.StringIO())
+
+    def test_reused_blob_is_kept(self):
+        name = self.save_old(b'image')
+        self.assertEqual(
+            self.storage.save('recipes/copy.png', ContentFile(b'image')),
+            name
+        )
+        self.cleanup()
+        self.assertTrue(self.storage.exists(name))
+
+    def test_orphans_are_deleted(self):
+        orphan = self.save_old(b'orphan')
+        referenced = self.save_old(b'referenced')
+        author = CustomUser.objects.create_user(
+            email='author@example.org',
+            username='author',
+            password='password'
+        )
+        Recipe.objects.create(author=author, name='recipe', text='text',
+                              cooking_time=10, image=referenced)
+        self.cleanup()
+        self.assertFalse(self.storage.exists(orphan))
+        self.assertTrue(self.storage.exists(referenced))
+
+
+class ReadSerializerTests(RecipeDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for size, image_format in (('small', 'webp'), ('small', 'jpeg'),
+                                   ('large', 'webp')):
+            ImageRendition.objects.create(
+                recipe=cls.recipes[0],
+                size=size,
+                format=image_format,
+                image=f'renditions/{size}.{image_format}'
+            )
+
+    def get_request(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return request
+
+    def assert_same_data(self, serializer_class, read_serializer_class,
+                         instances):
+        for user in (self.users[0], AnonymousUser()):
+            with self.subTest(serializer=read_serializer_class.__name__,
+                              user=user):
+                context = {'request': self.get_request(user)}
+                expected = serializer_class(
+                    instances, many=True, context=context
+                ).data
+                actual = read_serializer_class(
+                    instances, many=True, context=context
+                ).data
+                self.assertEqual(json.loads(json.dumps(expected)), actual)
+
+    def test_recipes(self):
+        recipes = list(RecipeViewSet.queryset.order_by('id'))
+        self.assert_same_data(RecipeSerializer, RecipeReadSerializer,
+                              recipes)
+        data = RecipeReadSerializer(
+            recipes,
+            many=True,
+            context={'request': self.get_request(self.users[0])}
+        ).data
+        # Both values of every flag are compared above.
+        for flag in ('is_favorited', 'is_in_shopping_cart'):
+            self.assertEqual({recipe[flag] for recipe in data}, {True, False})
+        self.assertEqual(
+            {recipe['author']['is_subscribed'] for recipe in data},
+            {True, False}
+        )
+        self.assertEqual(set(data[0]['renditions']), {'small', 'large'})
+
+    def test_tags(self):
+        self.assert_same_data(TagSerializer, TagReadSerializer,
+                              list(Tag.objects.all()))
+
+    def test_ingredients(self):
+        self.assert_same_data(IngredientSerializer, IngredientReadSerializer,
+                              list(Ingredient.objects.all()))
+        rows = list(
+            Ingredient.objects.values('id', 'name', 'measurement_unit')
+        )
+        self.assertEqual(
+            IngredientReadSerializer(rows, many=True).data,
+            IngredientSerializer(Ingredient.objects.all(), many=True).data
+        )
+
+    def test_users(self):
+        self.assert_same_data(CustomUserSerializer, UserReadSerializer,
+                              list(CustomUser.objects.all()))
+
+    def test_responses(self):
+        urls = [
+            '/api/recipes/',
+            f'/api/recipes/{self.recipes[0].pk}/',
+            '/api/tags/',
+            f'/api/tags/{self.tags[0].pk}/',
+            '/api/ingredients/',
+            '/api/ingredients/?name=ingredient',
+            f'/api/ingredients/{self.ingredients[0].pk}/',
+            '/api/users/',
+            f'/api/users/{self.users[1].pk}/',
+        ]
+        for client, url, timeout in product(
+            (self.client, self.anonymous), urls, (900, 0)
+        ):
+            with self.subTest(url=url, client=client, timeout=timeout):
+                responses = []
+                for fast in (True, False):
+                    cache.clear()
+                    with override_settings(FAST_READ_SERIALIZERS=fast,
+                                           RECIPE_CACHE_TIMEOUT=timeout):
+                        responses.append(client.get(url))
+                fast_response, drf_response = responses
+                self.assertEqual(fast_response.status_code,
+                                 drf_response.status_code)
+                self.assertEqual(fast_response.json(), drf_response.json())
+
+
+@skipIf(importlib.util.find_spec('orjson') is None, 'orjson is not installed')
+class FastJSONTests(SimpleTestCase):
+    def test_same_as_drf(self):
+        data = {
+            'text': 'Тест   "quoted"',
+            'numbers': [1, -2, 0.5, 10 ** 18],
+            'created': timezone.now(),
+            'nested': {'flag': True, 'empty': None},
+        }
+        self.assertEqual(FastJSONRenderer().render(data),
+                         JSONRenderer().render(data))
+
+    def test_non_finite_floats(self):
+        with self.assertRaises(ValueError):
+            JSONRenderer().render({'score': float('nan')})
+        self.assertEqual(
+            FastJSONRenderer().render(
+                {'score': float('nan'), 'top': float('inf')}
+            ),
+            b'{"score":null,"top":null}'
+        )
+
+
+class IngredientSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # SQLite compares only ASCII letters case-insensitively.
+        for name in ('соль', 'соль морская', 'сахар', 'масло сливочное',
+                     'сливки', 'перец черный', 'Pepper', 'paprika', 'капуста'):
+            Ingredient.objects.create(name=name, measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, name):
+        response = self.client.get('/api/ingredients/', {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()]
+
+    def test_prefix_matches_filter(self):
+        for name in ('с', 'сол', 'перец', 'п', 'к', 'соль м', 'p', 'P',
+                     'pep'):
+            with self.subTest(name=name):
+                expected = IngredientFilter(
+                    {'name': name},
+                    queryset=Ingredient.objects.all()
+                ).qs.values_list('name', flat=True)
+                self.assertEqual(self.search(name), list(expected))
+
+    def test_substring_fallback(self):
+        self.assertEqual(self.search('слив'), ['сливки'])
+        self.assertEqual(self.search('ливо'), ['масло сливочное'])
+        self.assertEqual(self.search('чер'), ['перец черный'])
+        self.assertEqual(self.search('нет'), [])
+
+
+class IngredientImportTests(TestCase):
+    rows = 'name,measurement_unit\nсоль,\nсахар,г\n"перец, черный",\n'
+
+    def assert_imported(self, use_copy):
+        stats = import_ingredients(io.StringIO(self.rows), 'csv',
+                                   use_copy=use_copy)
+        self.assertEqual(stats['created'], 3)
+        self.assertEqual(
+            dict(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {'соль': '', 'сахар': 'г', 'перец, черный': ''}
+        )
+
+    def test_empty_unit_in_batches(self):
+        self.assert_imported(use_copy=False)
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY needs PostgreSQL')
+    def test_empty_unit_with_copy(self):
+        self.assert_imported(use_copy=True)
+
+
+class RecipeTransferTests(RecipeDataMixin, TestCase):
+    def test_pub_date_is_restored(self):
+        published = timezone.now() - timedelta(days=30)
+        Recipe.objects.filter(pk=self.recipes[0].pk).update(
+            pub_date=published
+        )
+        lines = list(export_recipe_lines(
+            Recipe.objects.filter(pk__in=[self.recipes[0].pk,
+                                          self.recipes[1].pk])
+        ))
+        undated = json.loads(lines[1])
+        del undated['pub_date']
+        lines[1] = json.dumps(undated)
+        results = list(import_recipe_lines(lines))
+        imported = Recipe.objects.in_bulk(
+            [result['id'] for result in results]
+        )
+        self.assertEqual(imported[results[0]['id']].pub_date, published)
+        self.assertGreater(imported[results[1]['id']].pub_date,
+                           self.recipes[1].pub_date)
+
+    def test_zero_amount(self):
+        line = json.loads(next(export_recipe_lines(
+            Recipe.objects.filter(pk=self.recipes[0].pk)
+        )))
+        line['ingredients'][0]['amount'] = 0
+        result, = import_recipe_lines([json.dumps(line)])
+        self.assertIn('ingredients', result['errors'])
+
+
+class ShoppingCartTests(RecipeDataMixin, TestCase):
+    def test_formats(self):
+        for file_format in SHOP_LIST_EXPORTERS:
+            with self.subTest(file_format=file_format):
+                response = self.client.get(
+                    '/api/recipes/download_shopping_cart/'
+                    f'?format={file_format}'
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(b''.join(response.streaming_content))
+
+    @patch('api.exporters.PDF_FONT_NAME', 'MissingShopListFont')
+    @override_settings(SHOP_LIST_PDF_FONT='/nonexistent/font.ttf')
+    def test_pdf_without_font(self):
+        with self.assertLogs('api.views', 'ERROR'):
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/?format=pdf'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('errors', response.json())
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=txt'
+        )
+        self.assertEqual(response.status_code, 200)
@@ -1,3 +1,11 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Prefetch, Sum
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
@@ -5,46 +13,155 @@ from rest_framework.authentication import (SessionAuthentication,
                                            TokenAuthentication)
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from backend.negotiation import IgnoreFormatContentNegotiation
+from backend.pagination import (KeysetPagination,
+                                LimitPageNumberOrKeysetPagination,
+                                LimitPageNumberPagination)
+from users.models import Subscription
 from users.serializers import RecipeLiteSerializer
 
+from .caching import ReferenceCacheMixin
+from .counters import decrement
+from .exporters import SHOP_LIST_EXPORTERS
+from .feed import get_feed_timeline, invalidate_followers_feeds
 from .filters import IngredientFilter, RecipeFilter
+from .images import enqueue_image_processing
+from .ingredient_index import ingredient_index
 from .models import (FavoritRecipe, Ingredient, IngredientForRecipe, Recipe,
                      ShoppingList, Tag)
 from .permissions import OwnerOrAdminOrAuthenticatedOrReadOnly
+from .read_serializers import (IngredientReadSerializer, ReadSerializerMixin,
+                               RecipeReadSerializer, TagReadSerializer)
+from .recipe_cache import get_cached_recipes, overlay_user_flags
+from .recipe_transfer import export_recipe_lines, import_recipe_lines
 from .serializers import IngredientSerializer, RecipeSerializer, TagSerializer
 from .serve_functions import add_file_to_response, form_shop_list
 
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReferenceCacheMixin, ReadSerializerMixin,
+                 ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    read_serializer_class = TagReadSerializer
     pagination_class = None
     permission_classes = [AllowAny]
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, ReadSerializerMixin,
+                        ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    read_serializer_class = IngredientReadSerializer
     pagination_class = None
     permission_classes = [AllowAny]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def filter_queryset(self, queryset):
+        name = self.request.query_params.get('name')
+        if name and self.action == 'list':
+            return ingredient_index.search(name)
+        return super().filter_queryset(queryset)
 
-class RecipeViewSet(ModelViewSet):
-    queryset = Recipe.objects.all()
+
+class RecipeViewSet(ReadSerializerMixin, ModelViewSet):
+    queryset = Recipe.objects.prefetch_related(
+        Prefetch('tags', queryset=Tag.objects.all()),
+        Prefetch(
+            'ingredientforrecipe_set',
+            queryset=IngredientForRecipe.objects.select_related('ingredient')
+        ),
+        'renditions'
+    ).select_related('author')
     authentication_classes = [SessionAuthentication, TokenAuthentication]
     serializer_class = RecipeSerializer
+    read_serializer_class = RecipeReadSerializer
+    read_serializer_actions = ('list', 'retrieve', 'feed', 'popular')
     permission_classes = [OwnerOrAdminOrAuthenticatedOrReadOnly]
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    pagination_class = LimitPageNumberOrKeysetPagination
+    keyset_ordering = ('-pub_date', '-id')
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RECIPE_CACHE_TIMEOUT:
+            return super().list(request, *args, **kwargs)
+        # Only the page itself is read from the database, recipes come
+        # from the shared cache and flags from the user's cached sets.
+        queryset = self.filter_queryset(
+            self.get_queryset()
+        ).select_related(None).prefetch_related(None)
+        page = self.paginate_queryset(queryset)
+        recipes = page if page is not None else list(queryset)
+        bodies = get_cached_recipes(
+            recipes,
+            request.build_absolute_uri('/'),
+            self._serialize_recipes
+        )
+        results = [
+            overlay_user_flags(bodies[recipe.pk], request)
+            for recipe in recipes if recipe.pk in bodies
+        ]
+        if page is None:
+            return Response(results)
+        return self.get_paginated_response(results)
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        if recipe.image:
+            enqueue_image_processing(recipe)
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
+        invalidate_followers_feeds(self.request.user.pk)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        previous_image = serializer.instance.image.name
+        recipe = serializer.save()
+        if recipe.image and recipe.image.name != previous_image:
+            enqueue_image_processing(recipe)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=decrement('recipes_count')
+        )
+        invalidate_followers_feeds(instance.author_id)
+        instance.delete()
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=KeysetPagination
+    )
+    def feed(self, request, *args, **kwargs):
+        queryset = self.get_queryset().filter(
+            author__in=Subscription.objects.filter(
+                user=request.user
+            ).values('interesting_author')
+        )
+        page = None
+        if settings.FEED_CACHE_SIZE:
+            # The cached timeline is already ordered, so a page that fits
+            # in it is loaded by primary keys without the subquery.
+            ids, complete = get_feed_timeline(request.user, queryset)
+            page = self.paginator.paginate_ids(
+                ids, complete, self.get_queryset(), request, view=self
+            )
+        if page is None:
+            page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(
         detail=True,
@@ -52,11 +169,11 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def favorite(self, request, *args, **kwargs):
-        return self._create_link(request, FavoritRecipe)
+        return self._create_link(request, FavoritRecipe, 'favorites_count')
 
     @favorite.mapping.delete
     def delete_favorite(self, request, *args, **kwargs):
-        return self._delete_link(request, FavoritRecipe)
+        return self._delete_link(request, FavoritRecipe, 'favorites_count')
 
     @action(
         detail=True,
@@ -64,44 +181,139 @@ class RecipeViewSet(ModelViewSet):
         permission_classes=[IsAuthenticated]
     )
     def shopping_cart(self, request, *args, **kwargs):
-        return self._create_link(request, ShoppingList)
+        return self._create_link(
+            request,
+            ShoppingList,
+            'shopping_carts_count'
+        )
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, *args, **kwargs):
-        return self._delete_link(request, ShoppingList)
+        return self._delete_link(
+            request,
+            ShoppingList,
+            'shopping_carts_count'
+        )
 
     @action(
         methods=['get'],
         detail=False,
-        permission_classes=[IsAuthenticated]
+        pagination_class=LimitPageNumberPagination
+    )
+    def popular(self, request, *args, **kwargs):
+        queryset = self.get_queryset().filter(
+            popularity__isnull=False
+        ).order_by('-popularity__score', '-pub_date')
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatContentNegotiation
     )
     def download_shopping_cart(self, request, *args, **kwargs):
+        exporter = SHOP_LIST_EXPORTERS.get(
+            request.query_params.get('format', 'txt')
+        )
+        if exporter is None:
+            raise ValidationError(
+                {'errors': 'Available formats: '
+                           + ', '.join(SHOP_LIST_EXPORTERS)}
+            )
+        if exporter.check is not None:
+            # A streaming response can not turn into an error once the
+            # first chunk is sent.
+            try:
+                exporter.check()
+            except ImproperlyConfigured as error:
+                logger.error('Shopping list export failed: %s', error)
+                return Response(
+                    {'errors': f'Format {exporter.extension} is not '
+                               'available on this server'},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
         results = IngredientForRecipe.objects.filter(
             recipe__is_in_shopping_list__user=request.user
-        ).select_related('recipe').select_related('ingredient')
-        data = form_shop_list(results)
-        response = add_file_to_response(data, 'text/plain')
+        ).values_list(
+            'ingredient__name',
+            'ingredient__measurement_unit'
+        ).annotate(
+            total_amount=Sum('amount')
+        ).order_by('ingredient__name')
+        data = form_shop_list(results, exporter)
+        response = add_file_to_response(data, exporter)
         return response
 
-    def _create_link(self, request, model):
+    @action(
+        methods=['post'],
+        detail=False,
+        url_path='import',
+        permission_classes=[IsAdminUser]
+    )
+    def bulk_import(self, request, *args, **kwargs):
+        lines = []
+        if request.stream is not None:
+            lines = iter(request.stream.readline, b'')
+        results = list(import_recipe_lines(lines, request.user))
+        created = sum('id' in result for result in results)
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        })
+
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='export',
+        permission_classes=[IsAdminUser]
+    )
+    def bulk_export(self, request, *args, **kwargs):
+        return StreamingHttpResponse(
+            export_recipe_lines(
+                Recipe.objects.all(),
+                image_url=request.build_absolute_uri
+            ),
+            content_type='application/x-ndjson'
+        )
+
+    def _serialize_recipes(self, ids):
+        return self.get_serializer(
+            self.get_queryset().filter(pk__in=ids),
+            many=True
+        ).data
+
+    def _create_link(self, request, model, counter):
         object = get_object_or_404(Recipe, pk=self.kwargs['pk'])
         exists = model.objects.filter(
             user=request.user,
             recipe=object
         ).exists()
         if not exists:
-            model.objects.create(
-                user=request.user,
-                recipe=object
-            )
+            with transaction.atomic():
+                model.objects.create(
+                    user=request.user,
+                    recipe=object
+                )
+                Recipe.objects.filter(pk=object.pk).update(
+                    **{counter: F(counter) + 1}
+                )
             serializer = RecipeLiteSerializer(object)
             return Response(serializer.data,
                             status=status.HTTP_201_CREATED)
         raise ValidationError({"errors": 'Already exists'})
 
-    def _delete_link(self, request, model):
-        model.objects.filter(
+    @transaction.atomic
+    def _delete_link(self, request, model, counter):
+        deleted, __ = model.objects.filter(
             user=request.user,
             recipe__pk=self.kwargs['pk']
         ).delete()
+        if deleted:
+            Recipe.objects.filter(pk=self.kwargs['pk']).update(
+                **{counter: decrement(counter, deleted)}
+            )
         return Response(status=status.HTTP_204_NO_CONTENT)
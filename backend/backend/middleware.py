@@ -0,0 +1,136 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('backend.requests')
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class TimedSerializer:
+    """Proxies a serializer and counts the time spent in its data.
+
+    Queries the serializer runs meanwhile (lazy relations) stay in db_ms.
+    """
+
+    def __init__(self, serializer, request):
+        self._serializer = serializer
+        self._request = request
+
+    def __getattr__(self, name):
+        return getattr(self._serializer, name)
+
+    @property
+    def data(self):
+        recorder = self._request._metrics_queries
+        queries_before = recorder.duration
+        started = time.perf_counter()
+        try:
+            return self._serializer.data
+        finally:
+            self._request._metrics_serialize_time += (
+                time.perf_counter() - started
+                - (recorder.duration - queries_before)
+            )
+
+
+def time_serializer(serializer, request):
+    """Wraps the serializer if the request is measured."""
+    request = getattr(request, '_request', request)
+    if not hasattr(request, '_metrics_serialize_time'):
+        return serializer
+    return TimedSerializer(serializer, request)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        # Without REQUEST_METRICS Django drops the middleware on startup,
+        # so requests do not pass through it at all.
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request._metrics_queries = recorder
+        request._metrics_serialize_time = 0.0
+        request._metrics_render_time = 0.0
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(recorder)
+                )
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        # Serializers are timed through the views' get_serializer(), the
+        # rest of the view is app_ms.
+        serialize = request._metrics_serialize_time
+        render = request._metrics_render_time
+        metrics = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'serialize_ms': round(serialize * 1000, 2),
+            'render_ms': round(render * 1000, 2),
+            'app_ms': round(
+                (total - recorder.duration - serialize - render) * 1000, 2
+            ),
+            'total_ms': round(total * 1000, 2),
+        }
+        self.report(metrics)
+        response['Server-Timing'] = (
+            f'db;dur={metrics["db_ms"]};desc="{recorder.count} queries", '
+            f'serialize;dur={metrics["serialize_ms"]};desc="Serializers", '
+            f'render;dur={metrics["render_ms"]};desc="JSON rendering", '
+            f'app;dur={metrics["app_ms"]};desc="View", '
+            f'total;dur={metrics["total_ms"]}'
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF renders the serialized data after the view returns, which
+        # is the gap between this hook and the post-render callback.
+        render_started = time.perf_counter()
+
+        def finish_render(response):
+            request._metrics_render_time = (
+                time.perf_counter() - render_started
+            )
+
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def report(self, metrics):
+        too_many_queries = (
+            metrics['queries'] > settings.REQUEST_METRICS_MAX_QUERIES
+        )
+        too_slow = (
+            metrics['total_ms'] > settings.REQUEST_METRICS_MAX_DURATION
+        )
+        if too_many_queries or too_slow:
+            metrics['too_many_queries'] = too_many_queries
+            metrics['too_slow'] = too_slow
+            logger.warning(json.dumps(metrics))
+        else:
+            logger.info(json.dumps(metrics))
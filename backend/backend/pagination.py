@@ -1,5 +1,146 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = view.keyset_ordering
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_after_position(position))
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        results = list(queryset[:page_size + 1])
+        self.page = results[:page_size]
+        self.set_next_position(len(results) > page_size)
+        return self.page
+
+    def paginate_ids(self, ids, complete, queryset, request, view=None):
+        """Pages through ids already sorted by the view's keyset_ordering.
+
+        The last ordering field must be the primary key. Only the rows of
+        the page are loaded from queryset. Returns None if the cursor is
+        not in ids, or if ids end before the page does and are not
+        complete, so the caller can fall back to paginate_queryset.
+        """
+        self.request = request
+        self.ordering = view.keyset_ordering
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        start = 0
+        if position is not None:
+            try:
+                start = ids.index(position[-1]) + 1
+            except ValueError:
+                return None
+        page_ids = ids[start:start + page_size + 1]
+        if len(page_ids) <= page_size and not complete:
+            return None
+        rows = queryset.in_bulk(page_ids[:page_size])
+        self.page = [rows[pk] for pk in page_ids[:page_size] if pk in rows]
+        self.set_next_position(len(page_ids) > page_size and self.page)
+        return self.page
+
+    def set_next_position(self, has_next):
+        self.next_position = None
+        if has_next:
+            last = self.page[-1]
+            self.next_position = [
+                getattr(last, field.lstrip('-')) for field in self.ordering
+            ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def get_after_position(self, position):
+        conditions = []
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = {
+                previous.lstrip('-'): value
+                for previous, value in zip(self.ordering[:index], position)
+            }
+            condition[f'{field.lstrip("-")}__{lookup}'] = position[index]
+            conditions.append(Q(**condition))
+        return reduce(or_, conditions)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if (not isinstance(position, list)
+                or len(position) != len(self.ordering)):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(position, default=str).encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            encoded
+        )
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+
+class LimitPageNumberOrKeysetPagination(LimitPageNumberPagination):
+    keyset_pagination_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_paginator = None
+        cursor_query_param = self.keyset_pagination_class.cursor_query_param
+        if cursor_query_param in request.query_params:
+            self.keyset_paginator = self.keyset_pagination_class()
+            return self.keyset_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset_paginator is not None:
+            return self.keyset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
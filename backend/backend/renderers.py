@@ -0,0 +1,60 @@
+import logging
+
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+if orjson is None and settings.FAST_JSON:
+    logger.warning(
+        'FAST_JSON is on but orjson is not installed, the standard DRF '
+        'JSON renderer and parser are used'
+    )
+
+if orjson is not None:
+    # Dates go through the DRF encoder, which cuts microseconds to
+    # milliseconds and writes UTC as Z, unlike orjson.
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    The output is byte for byte the one of JSONRenderer with the default
+    compact, non-ASCII settings, except that floats in exponent notation
+    lose the plus sign (1e300 for 1e+300), and NaN and infinite floats
+    are written as null where JSONRenderer with STRICT_JSON raises
+    ValueError. Pretty printing, ASCII output and data orjson refuses
+    (e.g. integers over 64 bits) go to JSONRenderer.
+    """
+    default = encoders.JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {}) is not None):
+            return super().render(
+                data,
+                accepted_media_type,
+                renderer_context
+            )
+        try:
+            ret = orjson.dumps(data, default=self.default,
+                               option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(
+                data,
+                accepted_media_type,
+                renderer_context
+            )
+        # Same as JSONRenderer, keeps the output a JavaScript subset.
+        return ret.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
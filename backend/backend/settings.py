@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 
 from dotenv import load_dotenv
 
@@ -32,6 +33,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +79,90 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+REFERENCE_CACHE_TIMEOUT = int(os.environ.get('REFERENCE_CACHE_TIMEOUT', 900))
+
+POPULARITY_HALF_LIFE = timedelta(days=7)
+POPULARITY_COMMIT_LAG = timedelta(minutes=10)
+
+FEED_CACHE_SIZE = int(os.environ.get('FEED_CACHE_SIZE', 500))
+FEED_CACHE_TIMEOUT = int(os.environ.get('FEED_CACHE_TIMEOUT', 3600))
+
+SHOP_LIST_PDF_FONT = os.environ.get(
+    'SHOP_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 900))
+
+# Favorite, cart and follow flags are shown right after the user changes
+# them, so with a cache local to each process they are kept only briefly.
+MEMBERSHIP_CACHE_TIMEOUT = int(os.environ.get(
+    'MEMBERSHIP_CACHE_TIMEOUT',
+    30 if CACHES['default']['BACKEND'].endswith('.LocMemCache') else 3600
+))
+
+FAST_READ_SERIALIZERS = os.environ.get(
+    'FAST_READ_SERIALIZERS', 'true'
+).lower() == 'true'
+
+# Lets seed_benchmark and run_benchmark fill and measure this database.
+BENCHMARK_DATABASE = os.environ.get(
+    'BENCHMARK_DATABASE', 'false'
+).lower() == 'true'
+
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS', 'false').lower() == 'true'
+REQUEST_METRICS_MAX_QUERIES = int(
+    os.environ.get('REQUEST_METRICS_MAX_QUERIES', 20)
+)
+REQUEST_METRICS_MAX_DURATION = int(
+    os.environ.get('REQUEST_METRICS_MAX_DURATION', 500)
+)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'backend.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+)
+
+CONTENT_ADDRESSED_IMAGES = (
+    os.environ.get('CONTENT_ADDRESSED_IMAGES', 'false').lower() == 'true'
+)
+
+IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_TIMEOUT = timedelta(minutes=10)
+IMAGE_RENDITIONS = {
+    'small': 320,
+    'medium': 960,
+}
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -133,6 +219,19 @@ REST_FRAMEWORK = {
         'PAGE_SIZE': 6
 }
 
+# orjson is optional, without it the fast classes behave as DRF's own.
+FAST_JSON = os.environ.get('FAST_JSON', 'false').lower() == 'true'
+if FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'backend.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 DJOSER = {
     'HIDE_USERS': False,
     'PERMISSIONS': {
@@ -7,6 +7,8 @@ class CustomUser(AbstractUser):
     email = models.EmailField('email address', max_length=254, unique=True)
     first_name = models.CharField('first name', max_length=150)
     last_name = models.CharField('last name', max_length=150)
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -1,6 +1,8 @@
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
+from api.fields import RenditionsField
+from api.memberships import get_memberships
 from api.models import Recipe
 
 from .models import Subscription
@@ -14,20 +16,17 @@ class CustomUserSerializer(UserSerializer):
                   'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
-        if not self.context['request'].user.is_authenticated:
-            return False
-        if Subscription.objects.filter(
-            interesting_author__id=obj.id,
-            user=self.context['request'].user
-        ).exists():
-            return True
-        return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return obj.id in get_memberships(self.context['request'], Subscription)
 
 
 class RecipeLiteSerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "renditions", "cooking_time")
 
 
 class SubscriptionsUserSerializer(CustomUserSerializer):
@@ -40,15 +39,15 @@ class SubscriptionsUserSerializer(CustomUserSerializer):
                   'recipes_count')
 
     def get_recipes(self, obj):
-        query_params = self.context['request'].query_params
-        recipes_limit = query_params.get('recipes_limit', False)
-        if recipes_limit:
-            recipes_limit = int(recipes_limit)
-            recipes = Recipe.objects.filter(author=obj)[:recipes_limit]
-        else:
-            recipes = Recipe.objects.filter(author=obj)
+        if hasattr(obj, 'limited_recipes'):
+            return RecipeLiteSerializer(obj.limited_recipes, many=True).data
+        # The view validates recipes_limit and puts it in the context.
+        recipes = Recipe.objects.filter(author=obj)
+        recipes_limit = self.context.get('recipes_limit')
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
         serializer = RecipeLiteSerializer(recipes, many=True)
         return serializer.data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return obj.recipes_count
@@ -1,3 +1,6 @@
+from django.db import transaction
+from django.db.models import (BooleanField, F, OuterRef, Prefetch, Subquery,
+                              Value)
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework import status
@@ -8,12 +11,41 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from api.counters import decrement
+from api.feed import invalidate_feed
+from api.models import Recipe
+from api.read_serializers import ReadSerializerMixin, UserReadSerializer
+from backend.pagination import LimitPageNumberOrKeysetPagination
+
 from .models import Subscription, User
 from .serializers import CustomUserSerializer, SubscriptionsUserSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReadSerializerMixin, UserViewSet):
     authentication_classes = [SessionAuthentication, TokenAuthentication]
+    pagination_class = LimitPageNumberOrKeysetPagination
+    keyset_ordering = ('username', 'id')
+    read_serializer_class = UserReadSerializer
+
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is None:
+            return None
+        try:
+            recipes_limit = int(recipes_limit)
+        except ValueError:
+            recipes_limit = 0
+        if recipes_limit < 1:
+            raise ValidationError(
+                {"errors": "recipes_limit must be a positive integer"}
+            )
+        return recipes_limit
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action == 'subscriptions':
+            context['recipes_limit'] = self.get_recipes_limit()
+        return context
 
     @action(
         methods=["get"],
@@ -22,8 +54,20 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request, *args, **kwargs):
+        recipes = Recipe.objects.prefetch_related('renditions')
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
         user_subscriptions = User.objects.filter(
             followed__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
         )
         page = self.paginate_queryset(user_subscriptions)
         serializer = self.get_serializer(page, many=True)
@@ -45,10 +89,15 @@ class CustomUserViewSet(UserViewSet):
                 {"errors": "It's not allowed to subscribe on youself"}
             )
         if not existance:
-            Subscription.objects.create(
-                user=request.user,
-                interesting_author=interesting_author
-            )
+            with transaction.atomic():
+                Subscription.objects.create(
+                    user=request.user,
+                    interesting_author=interesting_author
+                )
+                User.objects.filter(pk=interesting_author.pk).update(
+                    followers_count=F('followers_count') + 1
+                )
+                invalidate_feed(request.user.pk)
             serializer = CustomUserSerializer(
                 interesting_author,
                 context={'request': request}
@@ -60,9 +109,15 @@ class CustomUserViewSet(UserViewSet):
         raise ValidationError({"errors": "Such subscription already exists"})
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def unsubscribe(self, request, *args, **kwargs):
-        Subscription.objects.filter(
+        deleted, __ = Subscription.objects.filter(
             user=request.user,
             interesting_author__id=self.kwargs['id']
         ).delete()
+        if deleted:
+            User.objects.filter(pk=self.kwargs['id']).update(
+                followers_count=decrement('followers_count', deleted)
+            )
+            invalidate_feed(request.user.pk)
         return Response(status=status.HTTP_204_NO_CONTENT)